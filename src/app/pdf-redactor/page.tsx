@@ -5,9 +5,10 @@ import { Navbar } from "@/components/ui/navbar";
 import { useEffect, useState } from "react";
 
 export default function PdfRedactorPage() {
-  const [file, setFile] = useState<File | null>(null);
-  const [fileLabel, setFileLabel] = useState("Choose file (no file chosen)");
+  const [files, setFiles] = useState<File[]>([]);
+  const [fileLabel, setFileLabel] = useState("Choose files (no file chosen)");
   const [downloadUrl, setDownloadUrl] = useState<string>("");
+  const [downloadName, setDownloadName] = useState<string>("");
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState<string>("");
 
@@ -18,15 +19,23 @@ export default function PdfRedactorPage() {
   }, [downloadUrl]);
 
   const handleUpload = async () => {
-    if (!file) return;
+    if (files.length === 0) return;
     setLoading(true);
     setError("");
 
+    // One PDF goes to /redact/; several files, or a zip of them, go to
+    // /redact/batch/ in a single request and come back as one zip
+    const single = files.length === 1 && !files[0].name.toLowerCase().endsWith(".zip");
+
     try {
       const formData = new FormData();
-      formData.append("file", file);
+      if (single) {
+        formData.append("file", files[0]);
+      } else {
+        files.forEach((f) => formData.append("files", f));
+      }
 
-      const res = await fetch("http://localhost:8000/redact/", {
+      const res = await fetch(`http://localhost:8000/redact/${single ? "" : "batch/"}`, {
         method: "POST",
         body: formData,
       });
@@ -39,6 +48,7 @@ export default function PdfRedactorPage() {
         if (old) URL.revokeObjectURL(old);
         return url;
       });
+      setDownloadName(single ? `redacted_${files[0].name}` : "redacted.zip");
     } catch (err) {
       console.error(err);
       setError("Failed to process PDF. Make sure the backend is running.");
@@ -56,7 +66,7 @@ export default function PdfRedactorPage() {
           <h1 className="text-3xl font-bold mb-2 text-rose-600">PDF Redactor</h1>
 
           <p className="text-gray-700 mb-6">
-            Upload your PDF and automatically redact sensitive information in seconds.
+            Upload your PDFs (or a zip of them) and automatically redact sensitive information in seconds.
           </p>
 
           <div className="mb-4 w-full">
@@ -64,12 +74,19 @@ export default function PdfRedactorPage() {
               <Input
                 id="file-upload"
                 type="file"
-                accept="application/pdf"
+                accept="application/pdf,application/zip,.zip"
+                multiple
                 className="hidden"
                 onChange={(e) => {
-                  const f = e.target.files?.[0] ?? null;
-                  setFile(f);
-                  setFileLabel(f ? f.name : "Choose file (no file chosen)");
+                  const chosen = Array.from(e.target.files ?? []);
+                  setFiles(chosen);
+                  setFileLabel(
+                    chosen.length === 0
+                      ? "Choose files (no file chosen)"
+                      : chosen.length === 1
+                        ? chosen[0].name
+                        : `${chosen.length} files chosen`
+                  );
                 }}
               />
               <div className="cursor-pointer text-center text-black w-full px-3 py-2 rounded border border-gray-300 bg-white hover:bg-rose-50 transition">
@@ -80,7 +97,7 @@ export default function PdfRedactorPage() {
 
           <button
             onClick={handleUpload}
-            disabled={loading || !file}
+            disabled={loading || files.length === 0}
             className="text-white bg-gradient-to-r from-rose-400 via-rose-500 to-rose-600 hover:bg-gradient-to-br focus:ring-4 focus:outline-none focus:ring-rose-300 font-medium rounded-lg text-sm px-5 py-2.5 text-center me-2 mb-2 disabled:opacity-50 transition-all"
           >
             {loading ? "Processing..." : "Upload & Redact"}
@@ -91,10 +108,10 @@ export default function PdfRedactorPage() {
           {downloadUrl && (
             <a
               href={downloadUrl}
-              download
+              download={downloadName}
               className="mt-6 inline-block bg-white font-semibold py-2 px-4 rounded hover:bg-rose-100 transition text-neutral-800 shadow hover:shadow-md"
             >
-              Download Redacted PDF
+              {downloadName.endsWith(".zip") ? "Download Redacted PDFs (zip)" : "Download Redacted PDF"}
             </a>
           )}
         </div>
@@ -0,0 +1,166 @@
+"""
+Admission control for the page pool.
+
+Every document is sized before any page is rendered: its page count, and for
+each page the memory it needs while being planned and applied (OCR render,
+preprocessing buffers, Tesseract's copy, output render and encoder), from
+the page dimensions at the highest resolution it can be rendered at. Two
+budgets are shared by all requests and jobs:
+
+- pending_pages bounds the pages admitted and not finished. /redact/,
+  /plan/ and /redact/batch/ (for all of its documents at once) wait up to
+  REDACT_ADMISSION_WAIT seconds for room, then answer 429 with Retry-After;
+  jobs wait in the job queue as long as it takes.
+- memory bounds the estimated bytes of the chunks running in the page pool.
+  A chunk holds one page at a time, so it reserves its largest page; chunks
+  wait for budget before they reach a worker, even if one is idle.
+
+A reservation bigger than a whole budget is let through once nothing else
+holds it, so oversized documents run alone instead of never.
+"""
+import asyncio
+import collections
+import os
+from contextlib import asynccontextmanager
+from typing import List, NamedTuple
+
+import fitz  # PyMuPDF
+
+try:
+    from .metrics import ADMISSION_RESERVED
+    from .page_output import output_dpi
+    from .preprocess import preprocessor
+    from .render import OCR_DPI_MODE, OCR_MAX_DPI
+except ImportError:
+    from metrics import ADMISSION_RESERVED
+    from page_output import output_dpi
+    from preprocess import preprocessor
+    from render import OCR_DPI_MODE, OCR_MAX_DPI
+
+# ---------------------
+# Configuration
+# ---------------------
+# Pages admitted across all requests and jobs before new documents wait.
+MAX_PENDING_PAGES = int(os.getenv("REDACT_MAX_PENDING_PAGES", "2000"))
+
+# Estimated bytes of page rasters in the page pool at once. Leave room for
+# the interpreter and MuPDF baseline of every worker when sizing it against
+# the container limit. 0 disables the memory budget.
+MEMORY_BUDGET_BYTES = int(os.getenv("REDACT_MEMORY_BUDGET_MB", "2048")) * 1024 * 1024
+
+# Seconds a /redact/ or /plan/ request waits for room before it gets a 429.
+ADMISSION_WAIT = float(os.getenv("REDACT_ADMISSION_WAIT", "10"))
+
+# Retry-After sent with a 429.
+RETRY_AFTER = int(os.getenv("REDACT_RETRY_AFTER", "30"))
+
+# Bytes held per OCR pixel: the grayscale render, the preprocessing buffers
+# (uint8 working copy, two uint16 blur passes, the 1-bit result) and
+# Tesseract's own copy. Adaptive thresholding adds an int64 integral image,
+# sums and scaled pixels.
+OCR_BYTES_PER_PIXEL = 11
+ADAPTIVE_BYTES_PER_PIXEL = 25
+
+# Bytes per output pixel: the RGB render the boxes are drawn on plus the
+# encoder's working copy.
+OUTPUT_BYTES_PER_PIXEL = 6
+
+
+class AdmissionError(Exception):
+    """No room for a request within its wait; retry after retry_after seconds."""
+
+    def __init__(self, message: str, retry_after: int = RETRY_AFTER):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+# ---------------------
+# Estimates
+# ---------------------
+def page_bytes(width: float, height: float, default_dpi: int) -> int:
+    """Peak memory of planning and applying a scanned page of width x height points."""
+    ocr_dpi = default_dpi if OCR_DPI_MODE == "fixed" else OCR_MAX_DPI
+    ocr_pixels = (width * ocr_dpi / 72) * (height * ocr_dpi / 72)
+    scale = output_dpi(ocr_dpi) / ocr_dpi
+    per_pixel = OCR_BYTES_PER_PIXEL
+    if preprocessor.threshold == "adaptive":
+        per_pixel += ADAPTIVE_BYTES_PER_PIXEL
+    return int(ocr_pixels * per_pixel + ocr_pixels * scale * scale * OUTPUT_BYTES_PER_PIXEL)
+
+
+class DocumentEstimate(NamedTuple):
+    pages: int
+    page_bytes: List[int]  # per page, as if every page were scanned
+
+    def chunk_bytes(self, start: int, stop: int) -> int:
+        """Reservation of a chunk of pages, which are worked on one at a time."""
+        return max(self.page_bytes[start:stop], default=0)
+
+
+def estimate_document(pdf_path: str, default_dpi: int) -> DocumentEstimate:
+    """Size a document from its page boxes, without loading any page."""
+    with fitz.open(pdf_path) as doc:
+        costs = []
+        for page_num in range(doc.page_count):
+            box = doc.page_cropbox(page_num)
+            costs.append(page_bytes(box.width, box.height, default_dpi))
+    return DocumentEstimate(len(costs), costs)
+
+
+# ---------------------
+# Budgets
+# ---------------------
+class Budget:
+    """
+    First come, first served counting semaphore over an amount (pages,
+    bytes). A capacity of 0 or less admits everything.
+    """
+
+    def __init__(self, name: str, capacity: int):
+        self.name = name
+        self.capacity = capacity
+        self.in_use = 0
+        self._waiters = collections.deque()
+        self._condition = None
+
+    def _fits(self, amount: int) -> bool:
+        return self.in_use == 0 or self.in_use + amount <= self.capacity
+
+    @asynccontextmanager
+    async def reserve(self, amount: int, timeout: float = None):
+        """
+        Hold `amount` for the duration of the block. Waits behind earlier
+        reservations; raises AdmissionError after `timeout` seconds (None:
+        wait as long as it takes).
+        """
+        if self.capacity <= 0:
+            yield
+            return
+        if self._condition is None:
+            self._condition = asyncio.Condition()
+        condition = self._condition
+        ticket = object()
+        async with condition:
+            self._waiters.append(ticket)
+            try:
+                await asyncio.wait_for(
+                    condition.wait_for(lambda: self._waiters[0] is ticket and self._fits(amount)), timeout
+                )
+            except asyncio.TimeoutError:
+                raise AdmissionError(f"Server is busy ({self.name} budget full), retry later")
+            finally:
+                self._waiters.remove(ticket)
+                condition.notify_all()
+            self.in_use += amount
+            ADMISSION_RESERVED.set(self.in_use, budget=self.name)
+        try:
+            yield
+        finally:
+            async with condition:
+                self.in_use -= amount
+                ADMISSION_RESERVED.set(self.in_use, budget=self.name)
+                condition.notify_all()
+
+
+pending_pages = Budget("pages", MAX_PENDING_PAGES)
+memory = Budget("memory", MEMORY_BUDGET_BYTES)
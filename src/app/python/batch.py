@@ -0,0 +1,192 @@
+"""
+Multi-document uploads and zip responses for /redact/batch/.
+
+A batch is any number of PDFs, given as separate files and/or zip archives
+of them. Every PDF is spooled into the batch work directory under a
+numbered file name (member paths from archives are never used on disk),
+within REDACT_BATCH_MAX_FILES documents and REDACT_BATCH_MAX_MB of
+uncompressed input. Results are written into a zip archive that is
+streamed as it grows: ZipStream hands back the bytes of each entry as it
+is written, so a finished document can be sent before the next one is done
+and only one COPY_CHUNK_SIZE piece is held in memory at a time.
+"""
+import os
+import shutil
+import zipfile
+from typing import List, NamedTuple
+
+try:
+    from .spool import COPY_CHUNK_SIZE
+except ImportError:
+    from spool import COPY_CHUNK_SIZE
+
+# ---------------------
+# Configuration
+# ---------------------
+# Documents accepted in one batch, counting every PDF inside archives.
+BATCH_MAX_FILES = int(os.getenv("REDACT_BATCH_MAX_FILES", "200"))
+
+# Uncompressed size of all documents of a batch.
+BATCH_MAX_BYTES = int(os.getenv("REDACT_BATCH_MAX_MB", "2048")) * 1024 * 1024
+
+# Documents of a batch redacted at the same time. Their pages take turns on
+# the page pool, so a few documents at once keeps every worker busy while
+# each of them still finishes (and is streamed back) early.
+BATCH_CONCURRENCY = int(os.getenv("REDACT_BATCH_CONCURRENCY", "4"))
+
+
+class BatchError(Exception):
+    """The upload is not a valid batch: no PDFs (400), or too many or too large (413)."""
+
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class BatchDocument(NamedTuple):
+    name: str      # file name in the upload, or member path in its archive
+    pdf_path: str  # spooled copy
+
+
+# ---------------------
+# Input
+# ---------------------
+def is_zip(fileobj) -> bool:
+    fileobj.seek(0)
+    return zipfile.is_zipfile(fileobj)
+
+
+def is_pdf_member(info: zipfile.ZipInfo) -> bool:
+    # Skip folders and the resource forks macOS adds to archives
+    return not info.is_dir() and info.filename.lower().endswith(".pdf") and not info.filename.startswith("__MACOSX/")
+
+
+class BatchSpool:
+    """Copies the documents of a batch into a work directory, enforcing the batch limits."""
+
+    def __init__(self, workdir: str, max_files: int = BATCH_MAX_FILES, max_bytes: int = BATCH_MAX_BYTES):
+        self.workdir = workdir
+        self.max_files = max_files
+        self.max_bytes = max_bytes
+        self.documents: List[BatchDocument] = []
+        self.total_bytes = 0
+
+    def _reserve(self, size: int):
+        if len(self.documents) >= self.max_files:
+            raise BatchError(f"A batch holds at most {self.max_files} documents", 413)
+        if self.total_bytes + size > self.max_bytes:
+            raise BatchError(f"A batch holds at most {self.max_bytes // (1024 * 1024)} MB of documents", 413)
+        self.total_bytes += size
+
+    def _path(self) -> str:
+        return os.path.join(self.workdir, f"input-{len(self.documents):04d}.pdf")
+
+    def add(self, fileobj, name: str):
+        """Spool an uploaded file: a PDF, or a zip archive whose PDF members are spooled."""
+        if is_zip(fileobj):
+            fileobj.seek(0)
+            with zipfile.ZipFile(fileobj) as archive:
+                for info in archive.infolist():
+                    if is_pdf_member(info):
+                        # file_size is checked against the data as it is read
+                        self._reserve(info.file_size)
+                        self._copy(archive.open(info), info.filename)
+            return
+        fileobj.seek(0, os.SEEK_END)
+        self._reserve(fileobj.tell())
+        fileobj.seek(0)
+        self._copy(fileobj, name)
+
+    def _copy(self, source, name: str):
+        path = self._path()
+        with source, open(path, "wb") as f:
+            shutil.copyfileobj(source, f, COPY_CHUNK_SIZE)
+        self.documents.append(BatchDocument(name, path))
+
+
+def spool_batch(uploads, workdir: str) -> List[BatchDocument]:
+    """Spool (file object, name) uploads into workdir; raises BatchError for an invalid batch."""
+    spool = BatchSpool(workdir)
+    try:
+        for fileobj, name in uploads:
+            spool.add(fileobj, name)
+    except zipfile.BadZipFile as e:
+        raise BatchError(f"Unreadable zip archive: {e}")
+    if not spool.documents:
+        raise BatchError("No PDF documents in the upload")
+    return spool.documents
+
+
+def output_names(documents: List[BatchDocument]) -> List[str]:
+    """redacted_<file name> per document, numbered where names repeat."""
+    names = []
+    taken = set()
+    for document in documents:
+        base, ext = os.path.splitext(os.path.basename(document.name.replace("\\", "/")) or "document.pdf")
+        name = f"redacted_{base}{ext}"
+        copy = 2
+        while name in taken:
+            name = f"redacted_{base} ({copy}){ext}"
+            copy += 1
+        taken.add(name)
+        names.append(name)
+    return names
+
+
+# ---------------------
+# Output
+# ---------------------
+class _Buffer:
+    """Write-only, unseekable file that collects what zipfile writes until it is drained."""
+
+    def __init__(self):
+        self.parts = []
+
+    def write(self, data) -> int:
+        self.parts.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self) -> bytes:
+        data = b"".join(self.parts)
+        self.parts = []
+        return data
+
+
+class ZipStream:
+    """
+    A zip archive written to a stream. Entries are stored, not deflated
+    (redacted PDFs are compressed already), with sizes in data descriptors
+    so nothing is seeked back to. write_file, write_bytes and close hand
+    back the bytes to send.
+    """
+
+    def __init__(self):
+        self._buffer = _Buffer()
+        self._archive = zipfile.ZipFile(self._buffer, "w", compression=zipfile.ZIP_STORED, allowZip64=True)
+
+    def open(self, name: str):
+        """An entry to write(); close() it before the next one."""
+        return self._archive.open(name, "w", force_zip64=True)
+
+    def drain(self) -> bytes:
+        return self._buffer.drain()
+
+    def write_file(self, name: str, path: str):
+        """Yield the bytes of an entry holding the file at path, one piece at a time."""
+        with open(path, "rb") as source, self.open(name) as entry:
+            while chunk := source.read(COPY_CHUNK_SIZE):
+                entry.write(chunk)
+                yield self.drain()
+        yield self.drain()
+
+    def write_bytes(self, name: str, data: bytes) -> bytes:
+        self._archive.writestr(name, data)
+        return self.drain()
+
+    def close(self) -> bytes:
+        """The central directory, which ends the archive."""
+        self._archive.close()
+        return self.drain()
@@ -0,0 +1,194 @@
+"""
+Benchmark every redaction entry point on synthetic text, scanned and mixed PDFs.
+
+Each (entry point, corpus) case runs in a fresh interpreter with the result
+cache disabled, so peak RSS is per case and repeats do real work. Reports
+pages/s, p50/p99 latency per document, peak RSS and output size, and writes
+everything to a JSON file; --compare prints the change against an earlier
+results file.
+
+    python src/app/python/benchmarks/bench_entrypoints.py [--pages 10] [--density 0.2] [--repeat 3]
+        [--entries redact_pdf_bytes redact_pdf] [--kinds text mixed] [--output results.json]
+        [--compare baseline.json]
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+import numpy as np  # noqa: E402
+
+from corpus import KINDS, make_corpus  # noqa: E402
+
+ENTRIES = ("redact_pdf_bytes", "redact_pdf", "redaction", "pdf_to_text")
+
+
+# ---------------------
+# Entry points (run inside the case process)
+# ---------------------
+def load_entry(entry: str, workdir: str):
+    """A function of the input PDF path returning the output size in bytes."""
+    if entry == "redact_pdf_bytes":
+        from fastAPI_redactor import redact_pdf_bytes
+
+        def run(pdf_path):
+            with open(pdf_path, "rb") as f:
+                return len(redact_pdf_bytes(f.read()))
+    elif entry == "redact_pdf":
+        from redactor import redact_pdf
+
+        def run(pdf_path):
+            with open(pdf_path, "rb") as f:
+                return len(redact_pdf(f.read()))
+    elif entry == "redaction":
+        from redactor import Redactor
+
+        redactor = Redactor(workdir)
+
+        def run(pdf_path):
+            return redactor.redaction(pdf_path, workdir)["output_bytes"]
+    elif entry == "pdf_to_text":
+        from ocr_text import pdf_to_text
+
+        def run(pdf_path):
+            return len(pdf_to_text(pdf_path).encode())
+    else:
+        raise ValueError(f"Unknown entry point {entry!r}")
+    return run
+
+
+def run_case(entry: str, pdf_path: str, repeat: int, warmup: int) -> dict:
+    with tempfile.TemporaryDirectory() as workdir:
+        run = load_entry(entry, workdir)
+        latencies = []
+        output_bytes = 0
+        for i in range(warmup + repeat):
+            start = time.perf_counter()
+            output_bytes = run(pdf_path)
+            if i >= warmup:
+                latencies.append(time.perf_counter() - start)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak_rss = usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
+    return {"latencies": latencies, "output_bytes": output_bytes, "peak_rss_bytes": peak_rss}
+
+
+# ---------------------
+# Driver
+# ---------------------
+def percentile(values, q: float) -> float:
+    return float(np.percentile(values, q)) if values else None
+
+
+def measure(entry: str, corpus, pdf_path: str, args) -> dict:
+    env = dict(os.environ, REDACT_CACHE_MAX_BYTES="0")
+    command = [sys.executable, __file__, "--case", entry, pdf_path, "--repeat", str(args.repeat), "--warmup", str(args.warmup)]
+    completed = subprocess.run(command, env=env, capture_output=True, text=True)
+    result = {"entry": entry, "kind": corpus.kind, "pages": corpus.pages, "density": args.density,
+              "seed": args.seed, "pii": corpus.pii, "input_bytes": len(corpus.pdf)}
+    if completed.returncode != 0:
+        result["error"] = completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "failed"
+        return result
+    case = json.loads(completed.stdout.strip().splitlines()[-1])
+    latencies = case["latencies"]
+    p50 = percentile(latencies, 50)
+    result.update({
+        "repeat": len(latencies),
+        "p50_s": round(p50, 4),
+        "p99_s": round(percentile(latencies, 99), 4),
+        "pages_per_s": round(corpus.pages / p50, 2) if p50 else None,
+        "peak_rss_mb": round(case["peak_rss_bytes"] / 1e6, 1),
+        "output_bytes": case["output_bytes"],
+    })
+    return result
+
+
+def metadata(args) -> dict:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCH_DIR, capture_output=True, text=True
+        ).stdout.strip() or None
+    except OSError:
+        commit = None
+    import fitz
+    import ocr
+    return {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "commit": commit,
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "pymupdf": fitz.VersionBind,
+        "ocr": ocr.ocr_signature(),
+        "args": {key: value for key, value in vars(args).items() if key not in ("case", "output", "compare")},
+    }
+
+
+def case_key(result: dict):
+    return result["entry"], result["kind"], result["pages"], result["density"], result["seed"]
+
+
+def print_result(result: dict, baseline: dict = None):
+    label = f"{result['entry']:17s} {result['kind']:8s}"
+    if "error" in result:
+        print(f"{label} error: {result['error']}")
+        return
+    line = (f"{label} {result['pages_per_s']:8.2f} pages/s  p50 {result['p50_s'] * 1000:8.1f} ms  "
+            f"p99 {result['p99_s'] * 1000:8.1f} ms  rss {result['peak_rss_mb']:7.1f} MB  out {result['output_bytes'] / 1e3:9.1f} kB")
+    if baseline and "error" not in baseline:
+        line += (f"  | pages/s x{result['pages_per_s'] / baseline['pages_per_s']:.2f}, "
+                 f"rss {result['peak_rss_mb'] - baseline['peak_rss_mb']:+.1f} MB, "
+                 f"out {result['output_bytes'] - baseline['output_bytes']:+d} B")
+    print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--entries", nargs="+", choices=ENTRIES, default=list(ENTRIES))
+    parser.add_argument("--kinds", nargs="+", choices=KINDS, default=list(KINDS))
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--density", type=float, default=0.2, help="share of lines carrying a PII value")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--warmup", type=int, default=1)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results file to compare against")
+    parser.add_argument("--case", nargs=2, metavar=("ENTRY", "PDF"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.case:
+        print(json.dumps(run_case(args.case[0], args.case[1], args.repeat, args.warmup)))
+        return
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = {case_key(result): result for result in json.load(f)["results"]}
+
+    results = []
+    with tempfile.TemporaryDirectory() as corpus_dir:
+        for kind in args.kinds:
+            corpus = make_corpus(kind, args.pages, args.density, args.seed)
+            pdf_path = os.path.join(corpus_dir, f"{kind}.pdf")
+            with open(pdf_path, "wb") as f:
+                f.write(corpus.pdf)
+            for entry in args.entries:
+                result = measure(entry, corpus, pdf_path, args)
+                print_result(result, baseline.get(case_key(result)))
+                results.append(result)
+
+    with open(args.output, "w") as f:
+        json.dump({"meta": metadata(args), "results": results}, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+"""
+Region-of-interest OCR against whole-page OCR on synthetic scans.
+
+Plans every page of each corpus twice, once OCRing whole pages and once
+OCRing only the ink regions ocr_regions finds, with the result cache
+disabled. Reports the share of the page sent to OCR, render/preprocess/OCR
+seconds per page, and how the PII found with regions compares with the
+whole-page baseline: recall (baseline matches also found) and precision
+(matches that are also in the baseline), over (page, category, text).
+
+    python src/app/python/benchmarks/bench_ocr_regions.py [--pages 5] [--kinds scanned sparse] [--dpi 300]
+"""
+import argparse
+import os
+import sys
+import time
+
+os.environ["REDACT_CACHE_MAX_BYTES"] = "0"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+
+from corpus import make_corpus  # noqa: E402
+from metrics import tracing  # noqa: E402
+from ocr_regions import find_text_regions  # noqa: E402
+from redaction_plan import Planner  # noqa: E402
+
+STAGES = ("render", "preprocess", "ocr")
+
+
+def run(planner: Planner, doc) -> dict:
+    start = time.perf_counter()
+    with tracing() as trace:
+        plan = planner.plan_document(doc)
+    elapsed = time.perf_counter() - start
+    matches = {(page.number, span.category, span.text) for page in plan.pages for span in page.spans}
+    seconds = trace.stage_seconds()
+    return {"seconds": elapsed, "stages": {name: seconds.get(name, 0.0) for name in STAGES}, "matches": matches}
+
+
+def coverage(doc) -> float:
+    """Share of the page area sent to OCR with regions, averaged over pages."""
+    shares = []
+    for page in doc:
+        regions = find_text_regions(page)
+        area = page.rect.get_area()
+        shares.append(1.0 if regions is None else sum(rect.get_area() for rect in regions) / area)
+    return sum(shares) / len(shares)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--kinds", nargs="+", choices=("scanned", "sparse"), default=["scanned", "sparse"])
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--density", type=float, default=0.2, help="share of lines carrying a PII value")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--dpi", type=int, default=300, help="default OCR resolution")
+    args = parser.parse_args()
+
+    planners = {"page": Planner(ocr_dpi=args.dpi, regions=False), "regions": Planner(ocr_dpi=args.dpi, regions=True)}
+    for kind in args.kinds:
+        corpus = make_corpus(kind, args.pages, args.density, args.seed)
+        with fitz.open(stream=corpus.pdf, filetype="pdf") as doc:
+            print(f"{kind}: {corpus.pages} pages, {sum(corpus.pii.values())} PII values, "
+                  f"regions cover {coverage(doc) * 100:.0f}% of the page")
+            results = {name: run(planner, doc) for name, planner in planners.items()}
+        for name, result in results.items():
+            per_page = {stage: result["stages"][stage] / corpus.pages * 1000 for stage in STAGES}
+            print(f"  {name:8s} {result['seconds'] / corpus.pages * 1000:8.0f} ms/page  "
+                  + "  ".join(f"{stage} {ms:6.0f} ms" for stage, ms in per_page.items())
+                  + f"  {len(result['matches'])} matches")
+        baseline, regions = results["page"], results["regions"]
+        found = baseline["matches"] & regions["matches"]
+        recall = len(found) / len(baseline["matches"]) if baseline["matches"] else 1.0
+        precision = len(found) / len(regions["matches"]) if regions["matches"] else 1.0
+        speedup = baseline["stages"]["ocr"] / max(regions["stages"]["ocr"], 1e-9)
+        print(f"  regions vs page: OCR x{speedup:.2f} faster, recall {recall:.3f}, precision {precision:.3f}")
+        for category, text in sorted({(c, t) for _, c, t in baseline["matches"] - regions["matches"]})[:5]:
+            print(f"    missed {category}: {text!r}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Benchmark the output encodings of redacted scanned pages.
+
+Renders a black-and-white letter page and a photo-like color page at 300 and
+500 DPI and writes each as a one-page PDF: with the PIL multipage save the
+redactors used to call, and with every page_output encoding at the
+configured REDACT_OUTPUT_DPI. Reports PDF size and encode time.
+
+    python src/app/python/benchmarks/bench_output.py [--repeat 3]
+"""
+import argparse
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from page_output import ENCODINGS, OUTPUT_DPI, PageSink  # noqa: E402
+
+
+def make_letter(dpi: int) -> Image.Image:
+    doc = fitz.open()
+    page = doc.new_page()
+    for row in range(45):
+        page.insert_text((54, 60 + row * 15), f"Line {row}: account 123-45-{row:04d}, call (555) 010-{row:04d}", fontsize=10)
+    pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+    return Image.frombytes("L", [pix.width, pix.height], pix.samples)
+
+
+def make_photo(dpi: int, seed: int = 0) -> Image.Image:
+    width, height = round(8.5 * dpi), round(11 * dpi)
+    y, x = np.mgrid[0:height, 0:width]
+    rgb = np.stack([x * 255 // width, y * 255 // height, (x + y) * 255 // (width + height)], axis=2)
+    noise = np.random.default_rng(seed).normal(0, 12, rgb.shape)
+    return Image.fromarray(np.clip(rgb + noise, 0, 255).astype(np.uint8), "RGB")
+
+
+def pil_save(img: Image.Image, dpi: int) -> bytes:
+    """The multipage save the redactors used to call."""
+    buffer = io.BytesIO()
+    img.save(buffer, "PDF", save_all=True, append_images=[])
+    return buffer.getvalue()
+
+
+def encoder_save(encoding: str):
+    def save(img: Image.Image, dpi: int) -> bytes:
+        with PageSink() as sink:
+            sink.add_image(fitz.paper_rect("a4"), img, dpi, encoding=encoding)
+            return sink.doc.tobytes(garbage=1, deflate=True)
+    return save
+
+
+def best_of(func, img, dpi, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(img, dpi)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    writers = [("PIL save", pil_save)]
+    writers += [(f"{encoding} @ {OUTPUT_DPI} dpi", encoder_save(encoding)) for encoding in ("auto",) + ENCODINGS]
+
+    for dpi in (300, 500):
+        for name, img in (("letter", make_letter(dpi)), ("photo", make_photo(dpi))):
+            print(f"{name} at {dpi} DPI: {img.width}x{img.height} {img.mode}")
+            for label, writer in writers:
+                elapsed, pdf = best_of(writer, img, dpi, args.repeat)
+                print(f"  {label:18s}: {len(pdf) / 1e3:10.1f} kB  {elapsed * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
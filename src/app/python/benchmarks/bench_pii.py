@@ -0,0 +1,105 @@
+"""
+Micro-benchmark for the PII matcher on a synthetic 10k-line corpus.
+
+Compares the shared PiiMatcher against the per-pattern re.findall loop it
+replaced, and checks that both find the same matches.
+
+    python src/app/python/benchmarks/bench_pii.py [--lines 10000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pii import US_STATES, default_matcher  # noqa: E402
+
+PROSE = [
+    "The quarterly audit covered inventory controls and vendor onboarding.",
+    "Findings were reviewed with the compliance team before sign-off.",
+    "No exceptions were noted for the sampled purchase orders.",
+    "Management agreed to update the access review procedure by next quarter.",
+]
+
+PII_LINES = [
+    "Contact jane.doe{n}@example.com for details.",
+    "Call us at (555) 123-{n:04d} during business hours.",
+    "SSN on file: 123-45-{n:04d}",
+    "Date of birth 04/{d:02d}/1987 was verified.",
+    "My name is Jane Doe and I approved the request.",
+    "Ship to {n} Main Street, Springfield, IL 62704",
+]
+
+
+def make_corpus(lines: int, pii_ratio: float, seed: int):
+    rng = random.Random(seed)
+    corpus = []
+    for n in range(lines):
+        if rng.random() < pii_ratio:
+            corpus.append(rng.choice(PII_LINES).format(n=n % 10000, d=n % 28 + 1))
+        else:
+            corpus.append(rng.choice(PROSE))
+    return corpus
+
+
+def legacy_get_sensitive_data(text_lines):
+    """The per-line, per-pattern loop used before the shared matcher."""
+    sensitive_matches = []
+    for line in text_lines:
+        for pattern in LEGACY_PATTERNS:
+            for match in re.findall(pattern, line):
+                if isinstance(match, tuple):
+                    sensitive_matches.append("".join(match))
+                else:
+                    sensitive_matches.append(match)
+    return sensitive_matches
+
+
+LEGACY_PATTERNS = [
+    r"[\w\.\d]+@[\w\d-]+\.[\w\d.-]+",
+    r"(\+1[-.\s]?)?(\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4})",
+    r"\b\d{3}[-\s]?\d{2}[-\s]?\d{4}\b",
+    r"\b(?:\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{4}-\d{1,2}-\d{1,2})\b",
+    r"(?i)(?:My name is|I am|He is|She is|Name:|name is) ([A-Z][a-z]+(?: [A-Z][a-z]+)+)",
+    r"\b\d{1,6}\s+[A-Za-z0-9.,'’\- ]+\s*,?\s*[A-Za-z\- ]+\s*,?\s*(?:%s)?\s+\d{5}(?:-\d{4})?\b" % US_STATES,
+]
+
+
+def best_of(func, corpus, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(corpus)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--lines", type=int, default=10000)
+    parser.add_argument("--pii-ratio", type=float, default=0.2)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    corpus = make_corpus(args.lines, args.pii_ratio, args.seed)
+    legacy_time, legacy_matches = best_of(legacy_get_sensitive_data, corpus, args.repeat)
+    engine_time, engine_matches = best_of(default_matcher.find_all, corpus, args.repeat)
+
+    print(f"corpus: {args.lines} lines, pii ratio {args.pii_ratio}")
+    print(f"legacy findall loop : {legacy_time * 1000:8.1f} ms  ({len(legacy_matches)} matches)")
+    print(f"shared matcher      : {engine_time * 1000:8.1f} ms  ({len(engine_matches)} matches)")
+    print(f"speedup             : {legacy_time / engine_time:8.2f}x")
+    if sorted(legacy_matches) != sorted(engine_matches):
+        missing = set(legacy_matches) - set(engine_matches)
+        extra = set(engine_matches) - set(legacy_matches)
+        print(f"DIFFERENT matches: only legacy {sorted(missing)[:10]}, only matcher {sorted(extra)[:10]}")
+        sys.exit(1)
+    print("matches             : identical")
+
+
+if __name__ == "__main__":
+    main()
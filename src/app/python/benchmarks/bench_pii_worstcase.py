@@ -0,0 +1,120 @@
+"""
+Worst-case inputs for the PII matcher: long lines built to make the
+patterns backtrack.
+
+For each adversarial line shape and doubling length, times the matcher and
+the address pattern it replaced, and fits how runtime grows with length
+(1 = linear, 2 = quadratic). Exits non-zero if the matcher grows faster
+than --max-exponent on any shape, or if it finds different matches from
+the old address pattern on any of the real address lines in ADDRESSES.
+
+    python src/app/python/benchmarks/bench_pii_worstcase.py [--max-chars 51200] [--legacy-max-chars 3200]
+"""
+import argparse
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pii import PATTERNS, SCANNED_PATTERNS, US_STATES, PiiMatcher, default_matcher, scanned_matcher  # noqa: E402
+
+LEGACY_ADDRESS = r"\b\d{1,6}\s+[A-Za-z0-9.,'’\- ]+\s*,?\s*[A-Za-z\- ]+\s*,?\s*(?:%s)?\s+\d{5}(?:-\d{4})?\b" % US_STATES
+
+# Repeated units; none of them ends in a ZIP code, so every address attempt fails
+SHAPES = {
+    "number-word": "1 a ",                 # an address start at every other token
+    "street-commas": "12 Main St, ",       # street, city, separators, no state or ZIP
+    "digit-runs": "123 456 ",              # phone/ssn prefixes that never complete
+    "name-trigger": "My name is Jane ",    # trigger followed by a single capitalized word
+    "email-dots": "a.b.c.d.e.f@",          # local parts without a domain
+}
+
+
+# Real addresses the matcher must redact exactly as the old pattern did
+ADDRESSES = [
+    "42 Wallaby Way Apt 5 Sydney Town North Some Place Big City CA 90210",  # more words than the cap
+    "Ship to: 1600 Pennsylvania Avenue NW, Washington, DC 20500",
+    "Call 555-123-4567 then 12 Main St, Springfield, IL 62704 ok",
+    "Box 7 and 9 Elm St Apt 3 Unit 4 Floor 2 Bldg 8 Wing 6 Town ST MA 02134",
+    "221 O'Connor Rd., Lake-View Heights, NY 10001-1234",
+    "Unit 12 1 Infinite Loop Cupertino CA 95014",
+]
+
+
+def check_addresses(legacy, matcher) -> bool:
+    """True if matcher and legacy find the same matches on every line of ADDRESSES."""
+    same = True
+    for line in ADDRESSES:
+        expected = list(legacy.finditer(line))
+        found = list(matcher.finditer(line))
+        if found != expected:
+            same = False
+            print(f"  MISMATCH {line!r}\n    legacy  {expected}\n    matcher {found}")
+    return same
+
+
+def time_line(matcher, line: str, repeat: int) -> float:
+    best = math.inf
+    for _ in range(repeat):
+        start = time.perf_counter()
+        list(matcher.finditer(line))
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def growth(sizes, timings) -> float:
+    """Slope of log(time) over log(length) between the two largest sizes."""
+    (n1, t1), (n2, t2) = list(zip(sizes, timings))[-2:]
+    return math.log(max(t2, 1e-9) / max(t1, 1e-9)) / math.log(n2 / n1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--min-chars", type=int, default=800)
+    parser.add_argument("--max-chars", type=int, default=51200)
+    parser.add_argument("--legacy-max-chars", type=int, default=3200,
+                        help="longest line to time the old address pattern on (it is quadratic)")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--max-exponent", type=float, default=1.5)
+    args = parser.parse_args()
+
+    legacy = PiiMatcher(dict(PATTERNS, address=LEGACY_ADDRESS))
+    matchers = {"default": default_matcher, "scanned": scanned_matcher}
+    sizes = []
+    size = args.min_chars
+    while size <= args.max_chars:
+        sizes.append(size)
+        size *= 2
+
+    failed = False
+    print("address equivalence with the old pattern")
+    legacies = {"default": legacy, "scanned": PiiMatcher(dict(SCANNED_PATTERNS, address=LEGACY_ADDRESS))}
+    for name, matcher in matchers.items():
+        same = check_addresses(legacies[name], matcher)
+        failed |= not same
+        print(f"  {name}: {'ok' if same else 'DIFFERENT'} on {len(ADDRESSES)} lines")
+    for shape, unit in SHAPES.items():
+        print(f"{shape} ({unit!r} repeated)")
+        timings = {name: [] for name in matchers}
+        for size in sizes:
+            line = (unit * (size // len(unit) + 1))[:size]
+            row = f"  {size:7d} chars"
+            for name, matcher in matchers.items():
+                seconds = time_line(matcher, line, args.repeat)
+                timings[name].append(seconds)
+                row += f"  {name} {seconds * 1000:9.2f} ms"
+            if size <= args.legacy_max_chars:
+                row += f"  legacy {time_line(legacy, line, 1) * 1000:9.2f} ms"
+            print(row)
+        for name, values in timings.items():
+            exponent = growth(sizes, values)
+            verdict = "ok" if exponent <= args.max_exponent else "SUPERLINEAR"
+            failed |= exponent > args.max_exponent
+            print(f"  {name}: runtime ~ length^{exponent:.2f} ({verdict})")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
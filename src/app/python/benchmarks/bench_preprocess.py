@@ -0,0 +1,72 @@
+"""
+Benchmark the NumPy preprocessing pipeline against the PIL chain it replaced.
+
+Renders a synthetic scanned letter page (text plus noise) at 300 and 500 DPI
+and times both, reporting how many output pixels differ.
+
+    python src/app/python/benchmarks/bench_preprocess.py [--repeat 3]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+import numpy as np  # noqa: E402
+from PIL import Image, ImageFilter, ImageOps  # noqa: E402
+
+from preprocess import Preprocessor  # noqa: E402
+
+
+def pil_chain(img):
+    """The preprocess_image every module used to carry."""
+    img = img.convert("L")
+    img = ImageOps.autocontrast(img)
+    img = img.filter(ImageFilter.GaussianBlur(radius=1))
+    img = img.point(lambda x: 0 if x < 128 else 255, "1")
+    return img
+
+
+def make_page(dpi: int, seed: int = 0) -> Image.Image:
+    doc = fitz.open()
+    page = doc.new_page()
+    for row in range(45):
+        page.insert_text((54, 60 + row * 15), f"Line {row}: account 123-45-{row:04d}, call (555) 010-{row:04d}", fontsize=10)
+    pix = page.get_pixmap(dpi=dpi)
+    pixels = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width, 3)
+    noise = np.random.default_rng(seed).normal(0, 18, pixels.shape)
+    pixels = np.clip(pixels * 0.8 + 30 + noise, 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels, "RGB")
+
+
+def best_of(func, img, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(img)
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    for dpi in (300, 500):
+        img = make_page(dpi)
+        print(f"{dpi} DPI page: {img.width}x{img.height}")
+        pil_time, expected = best_of(pil_chain, img, args.repeat)
+        print(f"  PIL chain         : {pil_time * 1000:8.1f} ms")
+        expected = np.asarray(expected)
+        for threshold in ("fixed", "otsu", "adaptive"):
+            preprocessor = Preprocessor(threshold=threshold)
+            elapsed, result = best_of(preprocessor, img, args.repeat)
+            differing = np.count_nonzero(np.asarray(result) != expected) / expected.size
+            print(f"  numpy ({threshold:8s}): {elapsed * 1000:8.1f} ms  ({differing:.2%} pixels differ from PIL)")
+
+
+if __name__ == "__main__":
+    main()
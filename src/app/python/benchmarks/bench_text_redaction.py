@@ -0,0 +1,61 @@
+"""
+Benchmark offset-based text redaction against per-match page.search_for.
+
+Builds a dense synthetic form (emails and phone numbers on every line) and
+redacts it with both TEXT_REDACTION_MODE settings.
+
+    python src/app/python/benchmarks/bench_text_redaction.py [--pages 5] [--rows 60]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fitz  # noqa: E402
+
+from pii import default_matcher  # noqa: E402
+from text_redaction import apply_text_redactions, find_text_redactions  # noqa: E402
+
+
+def make_form(pages: int, rows: int) -> bytes:
+    doc = fitz.open()
+    for page_num in range(pages):
+        page = doc.new_page()
+        for row in range(rows):
+            n = page_num * rows + row
+            line = f"{n:04d}  user{n % 50}@example.com  (555) 01{n % 10}-{n:04d}  Reviewed and approved"
+            page.insert_text((36, 40 + row * 12), line, fontsize=8)
+    return doc.tobytes()
+
+
+def run(pdf_bytes: bytes, mode: str):
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    start = time.perf_counter()
+    for page in doc:
+        found = find_text_redactions(page, matcher=default_matcher, mode=mode)
+        apply_text_redactions(page, [area for _, areas in found for area in areas])
+    elapsed = time.perf_counter() - start
+    leftover = sum(len(list(default_matcher.scan(page.get_text("text")))) for page in doc)
+    return elapsed, leftover
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--rows", type=int, default=60)
+    args = parser.parse_args()
+
+    pdf_bytes = make_form(args.pages, args.rows)
+    print(f"document: {args.pages} pages x {args.rows} rows")
+    results = {}
+    for mode in ("search", "offsets"):
+        elapsed, leftover = run(pdf_bytes, mode)
+        results[mode] = elapsed
+        print(f"{mode:8s}: {elapsed * 1000:8.1f} ms  ({leftover} PII strings left on the pages)")
+    print(f"speedup : {results['search'] / results['offsets']:8.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Deterministic synthetic PDF corpora for the benchmarks.
+
+Pages are letter-size forms of filler prose in which a seeded share of the
+lines carries one PII value (name, email, phone, SSN, date of birth or
+address). "text" documents keep the text layer, "scanned" documents are
+those pages rasterized with seeded noise and embedded as JPEG images,
+"mixed" documents interleave both, and "sparse" documents are scans of a
+short letter (a quarter of the lines, a photo and a signature line) with
+most of the page blank. The same (kind, pages, density, seed) always yields
+the same bytes.
+"""
+import io
+import random
+from typing import List, NamedTuple, Tuple
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+
+KINDS = ("text", "scanned", "mixed", "sparse")
+
+LINES_PER_PAGE = 40
+SPARSE_LINES = LINES_PER_PAGE // 4 + 1
+SCAN_DPI = 200
+
+FIRST_NAMES = ["Alice", "Bruno", "Chen", "Dana", "Elena", "Farid", "Grace", "Hiro", "Ines", "Jamal"]
+LAST_NAMES = ["Smith", "Okafor", "Larsen", "Nguyen", "Garcia", "Kowalski", "Haddad", "Moreau"]
+STREETS = ["Main Street", "Oak Avenue", "Pine Road", "Maple Drive", "Cedar Lane", "Elm Court"]
+CITIES = [("Springfield", "IL"), ("Portland", "OR"), ("Austin", "TX"), ("Albany", "NY"), ("Tampa", "FL")]
+FILLER = (
+    "the committee reviewed the quarterly report and agreed to schedule a follow up meeting "
+    "regarding budget allocations for the coming fiscal year with all department heads present"
+).split()
+
+
+class Corpus(NamedTuple):
+    kind: str
+    pdf: bytes
+    pages: int
+    pii: dict  # category -> values planted
+
+
+def _pii(rng: random.Random) -> Tuple[str, str]:
+    """(category, sentence carrying one PII value)."""
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    category = rng.choice(["name", "email", "phone", "ssn", "dob", "address"])
+    if category == "name":
+        return category, f"My name is {first} {last} and I approve this request"
+    if category == "email":
+        return category, f"Send the signed copy to {first.lower()}.{last.lower()}{rng.randint(1, 99)}@example.com today"
+    if category == "phone":
+        return category, f"Call me at ({rng.randint(200, 989)}) {rng.randint(200, 989)}-{rng.randint(0, 9999):04d} after noon"
+    if category == "ssn":
+        return category, f"Social security number {rng.randint(100, 899)}-{rng.randint(10, 99)}-{rng.randint(1000, 9999)} on file"
+    if category == "dob":
+        return category, f"Date of birth {rng.randint(1, 12)}/{rng.randint(1, 28)}/{rng.randint(1940, 2005)} confirmed"
+    city, state = rng.choice(CITIES)
+    return category, f"{rng.randint(1, 9999)} {rng.choice(STREETS)}, {city}, {state} {rng.randint(10000, 99999)}"
+
+
+def page_lines(rng: random.Random, density: float, pii: dict, count: int = LINES_PER_PAGE) -> List[str]:
+    """One page of lines; each carries a PII value with probability density."""
+    lines = []
+    for _ in range(count):
+        if rng.random() < density:
+            category, line = _pii(rng)
+            pii[category] = pii.get(category, 0) + 1
+        else:
+            line = " ".join(rng.choice(FILLER) for _ in range(rng.randint(8, 14))).capitalize() + "."
+        lines.append(line)
+    return lines
+
+
+def _write_text_page(doc, lines: List[str]):
+    page = doc.new_page()
+    for row, line in enumerate(lines):
+        page.insert_text((54, 56 + row * 17), line, fontsize=10)
+    return page
+
+
+def _write_sparse_page(doc, lines: List[str], seed: int):
+    """A short letter: lines at the top, a photo, and the last line as a signature at the bottom."""
+    page = _write_text_page(doc, lines[:-1])
+    rng = np.random.default_rng(seed)
+    photo = rng.integers(0, 256, (120, 160), dtype=np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(photo, "L").resize((480, 360)).save(buffer, "PNG")
+    page.insert_image(fitz.Rect(340, 260, 540, 410), stream=buffer.getvalue())
+    page.insert_text((54, 700), lines[-1], fontsize=10)
+    return page
+
+
+def _write_scanned_page(doc, lines: List[str], seed: int, sparse: bool = False):
+    """Rasterize the lines at SCAN_DPI with noise and embed them as a JPEG-only page."""
+    scratch = fitz.open()
+    source = _write_sparse_page(scratch, lines, seed) if sparse else _write_text_page(scratch, lines)
+    pix = source.get_pixmap(dpi=SCAN_DPI, colorspace=fitz.csGRAY)
+    pixels = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.width)
+    noise = np.random.default_rng(seed).normal(0, 6, pixels.shape)
+    pixels = np.clip(pixels * 0.9 + 20 + noise, 0, 255).astype(np.uint8)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels, "L").save(buffer, "JPEG", quality=75)
+    page = doc.new_page()
+    page.insert_image(page.rect, stream=buffer.getvalue())
+
+
+def make_corpus(kind: str, pages: int = 10, density: float = 0.2, seed: int = 0, scanned_every: int = 3) -> Corpus:
+    """
+    Build a document of `pages` pages. Mixed documents make every
+    scanned_every-th page a scan.
+    """
+    if kind not in KINDS:
+        raise ValueError(f"Unknown corpus kind {kind!r}")
+    rng = random.Random(f"{kind}:{seed}")
+    doc = fitz.open()
+    pii = {}
+    for page_num in range(pages):
+        lines = page_lines(rng, density, pii, SPARSE_LINES if kind == "sparse" else LINES_PER_PAGE)
+        scanned = kind in ("scanned", "sparse") or (kind == "mixed" and page_num % scanned_every == scanned_every - 1)
+        if scanned:
+            _write_scanned_page(doc, lines, seed * 100003 + page_num, sparse=kind == "sparse")
+        else:
+            _write_text_page(doc, lines)
+    # No timestamps or random IDs, so the bytes only depend on the arguments
+    doc.set_metadata({})
+    return Corpus(kind, doc.tobytes(garbage=1, deflate=True, no_new_id=True), pages, pii)
@@ -0,0 +1,94 @@
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+try:
+    from .db import iter_pdf_batches, save_redacted_pdfs
+    from .redactor import redact_pdf
+except ImportError:
+    from db import iter_pdf_batches, save_redacted_pdfs
+    from redactor import redact_pdf
+
+
+def redact_row(row):
+    """Redact one (id, file_name, pdf_bytes) row. Runs inside a pool worker."""
+    file_id, file_name, pdf_bytes = row
+    try:
+        return file_id, file_name, redact_pdf(pdf_bytes), None
+    except Exception as e:
+        return file_id, file_name, None, str(e)
+
+
+def bulk_redact(ids=None, batch_size: int = 50, workers: int = None, prefix: str = "redacted_", after_id: int = 0):
+    """
+    Re-redact rows of pdf_files. Batches are streamed from the database,
+    redacted across a process pool, and written back with one batched INSERT
+    per batch while the next batch is being redacted. Rows named with
+    `prefix`, the copies this function saves, are never redacted again.
+
+    last_id is where to resume (--after-id): the last id of the last batch
+    written, so a resumed run redoes no row that was saved. It is reported
+    after every batch, with the ids that failed so far, which are retried by
+    passing them as ids. Returns (redacted, failed_ids, last_id).
+    """
+    workers = workers or os.cpu_count() or 1
+    redacted = 0
+    failed_ids = []
+    last_id = after_id
+    pending = None
+
+    def write(results):
+        nonlocal redacted, last_id
+        rows = []
+        for file_id, file_name, pdf_bytes, error in results:
+            if error is None:
+                rows.append((f"{prefix}{file_name}", pdf_bytes))
+            else:
+                failed_ids.append(file_id)
+                print(f"[{file_id}] {file_name}: {error}", file=sys.stderr)
+            last_id = file_id
+        if rows:
+            save_redacted_pdfs(rows)
+        redacted += len(rows)
+        print(f"Rows up to id {last_id} done: {redacted} redacted, {len(failed_ids)} failed; "
+              f"resume with --after-id {last_id}{retry_hint(failed_ids)}", file=sys.stderr)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for batch in iter_pdf_batches(ids, batch_size, after_id, prefix):
+            results = executor.map(redact_row, batch, chunksize=max(1, len(batch) // (workers * 4)))
+            if pending is not None:
+                write(pending)
+            pending = results
+        if pending is not None:
+            write(pending)
+    return redacted, failed_ids, last_id
+
+
+def retry_hint(failed_ids) -> str:
+    """How to retry the failed rows: run again with their ids."""
+    return f"; retry failed rows by passing their ids: {' '.join(map(str, failed_ids))}" if failed_ids else ""
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-redact PDFs stored in the pdf_files table.")
+    parser.add_argument("ids", nargs="*", type=int, help="IDs to redact (default: every row)")
+    parser.add_argument("--batch-size", type=int, default=50, help="rows fetched and written per round trip")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="redaction processes")
+    parser.add_argument("--prefix", default="redacted_",
+                        help="prefix for the new file names; rows named with it are skipped")
+    parser.add_argument("--after-id", type=int, default=0, help="resume after this ID (as reported after each batch)")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    redacted, failed_ids, last_id = bulk_redact(
+        args.ids or None, args.batch_size, args.workers, args.prefix, args.after_id
+    )
+    elapsed = time.perf_counter() - start
+    print(f"Redacted {redacted} PDFs ({len(failed_ids)} failed) in {elapsed:.1f}s, "
+          f"resume with --after-id {last_id}{retry_hint(failed_ids)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,155 @@
+"""
+Content-addressed disk cache for redacted documents and OCR output.
+
+Entries are files named by the SHA-256 key under REDACT_CACHE_DIR. Reads
+touch the file's mtime, and writes evict the least recently used entries
+once the cache grows past REDACT_CACHE_MAX_BYTES. Several processes can
+share the same directory; writes are atomic renames.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+CACHE_DIR = os.getenv("REDACT_CACHE_DIR") or os.path.join(tempfile.gettempdir(), "redact-cache")
+
+# Set to 0 to disable caching.
+CACHE_MAX_BYTES = int(os.getenv("REDACT_CACHE_MAX_BYTES", str(1024 ** 3)))
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+
+def hash_key(*parts) -> str:
+    """Build a cache key from strings/bytes (e.g. a content hash and config values)."""
+    digest = hashlib.sha256()
+    for part in parts:
+        if isinstance(part, str):
+            part = part.encode()
+        digest.update(len(part).to_bytes(8, "little"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def bytes_digest(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def file_digest(path: str) -> str:
+    """SHA-256 of a file, read in chunks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        while chunk := f.read(HASH_CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class DiskCache:
+    def __init__(self, root: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        # Size estimate so a write only walks the cache when it may be full.
+        # Other processes writing to the same directory are picked up on the next walk.
+        self._estimated_bytes = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    def _path(self, namespace: str, key: str) -> str:
+        return os.path.join(self.root, namespace, key[:2], key)
+
+    def get_path(self, namespace: str, key: str):
+        """Return the path of a cached entry (marking it as recently used), or None."""
+        if not self.enabled:
+            return None
+        path = self._path(namespace, key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def get(self, namespace: str, key: str):
+        path = self.get_path(namespace, key)
+        if path is None:
+            return None
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def copy_to(self, namespace: str, key: str, dest: str) -> bool:
+        """Copy a cached entry to dest. Returns False on a miss."""
+        path = self.get_path(namespace, key)
+        if path is None:
+            return False
+        try:
+            shutil.copyfile(path, dest)
+        except FileNotFoundError:
+            return False
+        return True
+
+    def _write(self, namespace: str, key: str, writer):
+        path = self._path(namespace, key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                writer(f)
+                size = f.tell()
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+        if self._estimated_bytes is not None:
+            self._estimated_bytes += size
+        if self._estimated_bytes is None or self._estimated_bytes > self.max_bytes:
+            self.evict()
+
+    def put(self, namespace: str, key: str, data: bytes):
+        if self.enabled:
+            self._write(namespace, key, lambda f: f.write(data))
+
+    def put_file(self, namespace: str, key: str, src: str):
+        if self.enabled:
+            with open(src, "rb") as source:
+                self._write(namespace, key, lambda f: shutil.copyfileobj(source, f, HASH_CHUNK_SIZE))
+
+    def get_json(self, namespace: str, key: str):
+        data = self.get(namespace, key)
+        return None if data is None else json.loads(data)
+
+    def put_json(self, namespace: str, key: str, value):
+        self.put(namespace, key, json.dumps(value, separators=(",", ":")).encode())
+
+    def evict(self):
+        """Remove least recently used entries until the cache fits in max_bytes."""
+        entries = []
+        total = 0
+        for dirpath, _, filenames in os.walk(self.root):
+            for name in filenames:
+                if name.startswith(".tmp-"):
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+        if total > self.max_bytes:
+            entries.sort()
+            for _, size, path in entries:
+                try:
+                    os.unlink(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+                if total <= self.max_bytes:
+                    break
+        self._estimated_bytes = total
+
+
+cache = DiskCache()
@@ -0,0 +1,118 @@
+import os
+from contextlib import contextmanager
+
+import psycopg2
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
+
+# ---------------------
+# Connection pool
+# ---------------------
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "4"))
+
+_pool = None
+_pool_pid = None
+
+
+def get_pool() -> ThreadedConnectionPool:
+    """
+    Return this process's connection pool, creating it on first use.
+    Connections are never shared with forked children.
+    """
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        database_url = os.getenv("DATABASE_URL")
+        if not database_url:
+            raise ValueError("DATABASE_URL not set in environment")
+        _pool = ThreadedConnectionPool(DB_POOL_MIN, DB_POOL_MAX, database_url)
+        _pool_pid = os.getpid()
+    return _pool
+
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection; commits on success, rolls back on error."""
+    pool = get_pool()
+    conn = pool.getconn()
+    try:
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        pool.putconn(conn)
+
+
+# ---------------------
+# Single rows
+# ---------------------
+def fetch_pdf_row(file_id: int):
+    """Return (file_name, pdf_bytes) for an ID, or None."""
+    with connection() as conn, conn.cursor() as cursor:
+        cursor.execute("SELECT file_name, file_data FROM pdf_files WHERE id = %s", (file_id,))
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    file_name, pdf_bytes = row
+    return file_name, bytes(pdf_bytes)
+
+
+def fetch_pdf(file_id: int):
+    """
+    Fetch a PDF from the database by ID.
+    Returns (file_name, pdf_bytes)
+    """
+    row = fetch_pdf_row(file_id)
+    if row is None:
+        raise ValueError(f"No PDF found with ID {file_id}")
+    return row
+
+
+def save_redacted_pdf(file_name: str, pdf_bytes: bytes):
+    """
+    Save a redacted PDF back into the database as a new row.
+    """
+    save_redacted_pdfs([(file_name, pdf_bytes)])
+    print(f"Saved redacted PDF as {file_name} in database")
+
+
+# ---------------------
+# Bulk access
+# ---------------------
+def save_redacted_pdfs(rows, page_size: int = 100):
+    """Insert many (file_name, pdf_bytes) rows with batched multi-row INSERTs."""
+    with connection() as conn, conn.cursor() as cursor:
+        execute_values(
+            cursor,
+            "INSERT INTO pdf_files (file_name, file_data) VALUES %s",
+            [(file_name, psycopg2.Binary(pdf_bytes)) for file_name, pdf_bytes in rows],
+            page_size=page_size,
+        )
+
+
+def iter_pdf_batches(ids=None, batch_size: int = 50, after_id: int = 0, exclude_prefix: str = None):
+    """
+    Stream (id, file_name, pdf_bytes) rows from pdf_files in lists of
+    batch_size, ordered by id, through a server-side cursor so the result set
+    is never loaded at once. Restrict to `ids` if given, and skip rows whose
+    file name starts with exclude_prefix (redacted copies saved by earlier
+    runs).
+    """
+    query = "SELECT id, file_name, file_data FROM pdf_files WHERE id > %s"
+    params = [after_id]
+    if ids is not None:
+        query += " AND id = ANY(%s)"
+        params.append(list(ids))
+    if exclude_prefix:
+        # left() rather than LIKE, whose wildcards include the "_" of "redacted_"
+        query += " AND left(coalesce(file_name, ''), %s) <> %s"
+        params += [len(exclude_prefix), exclude_prefix]
+    query += " ORDER BY id"
+
+    with connection() as conn, conn.cursor(name="iter_pdf_batches") as cursor:
+        cursor.itersize = batch_size
+        cursor.execute(query, params)
+        while rows := cursor.fetchmany(batch_size):
+            yield [(file_id, file_name, bytes(file_data)) for file_id, file_name, file_data in rows]
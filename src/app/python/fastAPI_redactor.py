@@ -1,10 +1,44 @@
-from fastapi import FastAPI, UploadFile, File
-from fastapi.responses import StreamingResponse
+from fastapi import FastAPI, HTTPException, UploadFile, File
+from contextlib import AsyncExitStack
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 import io
-from PIL import Image, ImageDraw, ImageFilter, ImageOps
-import pytesseract
+import json
+import logging
+import os
 import fitz  # PyMuPDF
-import re
+import asyncio
+from typing import List, NamedTuple
+
+try:
+    from .admission import ADMISSION_WAIT, AdmissionError, DocumentEstimate, estimate_document, memory, pending_pages
+    from .batch import BATCH_CONCURRENCY, BatchDocument, BatchError, ZipStream, output_names, spool_batch
+    from .cache import cache, file_digest, hash_key
+    from .jobs import JOB_FAILED, Job, JobError, JobQueue, QueueFullError
+    from .metrics import (
+        DOCUMENT_SECONDS, DOCUMENTS, IN_FLIGHT, JOBS, PAGES_IN_FLIGHT, REDACT_TRACE, Trace, absorb, registry, stage,
+        tracing,
+    )
+    from .ocr import warm_up
+    from .page_output import EncodeStats, PageSink, output_signature
+    from .redaction_plan import DocumentPlan, Planner, redact_pages
+    from .spool import iter_file, make_workdir, remove_workdir, spool_upload
+    from .worker_pool import PagePool
+except ImportError:
+    from admission import ADMISSION_WAIT, AdmissionError, DocumentEstimate, estimate_document, memory, pending_pages
+    from batch import BATCH_CONCURRENCY, BatchDocument, BatchError, ZipStream, output_names, spool_batch
+    from cache import cache, file_digest, hash_key
+    from jobs import JOB_FAILED, Job, JobError, JobQueue, QueueFullError
+    from metrics import (
+        DOCUMENT_SECONDS, DOCUMENTS, IN_FLIGHT, JOBS, PAGES_IN_FLIGHT, REDACT_TRACE, Trace, absorb, registry, stage,
+        tracing,
+    )
+    from ocr import warm_up
+    from page_output import EncodeStats, PageSink, output_signature
+    from redaction_plan import DocumentPlan, Planner, redact_pages
+    from spool import iter_file, make_workdir, remove_workdir, spool_upload
+    from worker_pool import PagePool
+
+logger = logging.getLogger(__name__)
 
 app = FastAPI()
 
@@ -17,103 +51,457 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Ensure Tesseract path inside Docker
-pytesseract.pytesseract.tesseract_cmd = "/usr/bin/tesseract"  # Adjust for container
+# Default resolution scanned pages are rendered at for OCR (see render.py)
+OCR_DPI = 300
 
-# ---------------------
-# Redaction helpers
-# ---------------------
-def preprocess_image(img: Image.Image) -> Image.Image:
-    img = img.convert("L")
-    img = ImageOps.autocontrast(img)
-    img = img.filter(ImageFilter.GaussianBlur(radius=1))
-    img = img.point(lambda x: 0 if x < 128 else 255, "1")
-    return img
-
-def get_sensitive_data(text_lines):
-    patterns = {
-        "email": r"[\w\.\d]+@[\w\d-]+\.[\w\d.-]+",
-        "phone": r"(\+1[-.\s]?)?(\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4})",
-        "ssn": r"\b\d{3}[-\s]?\d{2}[-\s]?\d{4}\b",
-        "dob": r"\b(?:\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{4}-\d{1,2}-\d{1,2})\b",
-        "name": r"(?i)(?:My name is|I am|He is|She is|Name:|name is) ([A-Z][a-z]+(?: [A-Z][a-z]+)+)",
-        "address": r"\b\d{1,6}\s+[A-Za-z0-9.,'’\- ]+\s*,?\s*[A-Za-z\- ]+\s*,?\s*(?:AL|AK|AZ|AR|CA|CO|CT|DE|FL|GA|HI|ID|IL|IN|IA|KS|KY|LA|ME|MD|MA|MI|MN|MS|MO|MT|NE|NV|NH|NJ|NM|NY|NC|ND|OH|OK|OR|PA|RI|SC|SD|TN|TX|UT|VT|VA|WA|WV|WI|WY)?\s+\d{5}(?:-\d{4})?\b"
-    }
-    sensitive_matches = []
-    for line in text_lines:
-        for pattern in patterns.values():
-            for match in re.findall(pattern, line):
-                if isinstance(match, tuple):
-                    sensitive_matches.append("".join(match))
-                else:
-                    sensitive_matches.append(match)
-    return sensitive_matches
+planner = Planner(ocr_dpi=OCR_DPI)
 
 # ---------------------
 # Main redaction logic
 # ---------------------
-def redact_pdf_bytes(pdf_bytes: bytes) -> bytes:
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    scanned_images = []
-
-    for page_num, page in enumerate(doc):
-        page.wrap_contents()
-        text = page.get_text("text").strip()
-
-        if text:
-            sensitive_data = get_sensitive_data(text.splitlines())
-            for data in sensitive_data:
-                areas = page.search_for(data)
-                [page.add_redact_annot(area, fill=(0, 0, 0)) for area in areas]
-            page.apply_redactions()
-        else:
-            pix = page.get_pixmap(dpi=300)
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            img_preprocessed = preprocess_image(img)
-
-            ocr_data = pytesseract.image_to_data(
-                img_preprocessed, output_type=pytesseract.Output.DICT, config="--oem 1 --psm 3"
-            )
+class ChunkResult(NamedTuple):
+    path: str           # PDF holding the redacted pages of the range, in page order
+    stats: EncodeStats  # how its page images were encoded
+    trace: Trace        # metrics recorded while redacting it
+
+
+class ChunkPlan(NamedTuple):
+    pages: list   # PagePlan of each page of the range
+    trace: Trace  # metrics recorded while planning it
+
+
+def plan_page_range(pdf_path: str, digest: str, start: int, stop: int) -> ChunkPlan:
+    """Plan pages [start, stop) of a document (cached by digest). Runs inside a pool worker."""
+    with tracing() as trace, fitz.open(pdf_path) as doc:
+        plan = planner.plan_document(doc, digest, range(start, stop))
+    return ChunkPlan(plan.pages, trace)
+
+
+def redact_page_range(pdf_path: str, workdir: str, digest: str, start: int, stop: int) -> ChunkResult:
+    """Redact pages [start, stop) of a document into workdir. Runs inside a pool worker."""
+    chunk_path = os.path.join(workdir, f"chunk-{start:06d}.pdf")
+    with tracing() as trace, fitz.open(pdf_path) as doc, PageSink() as sink:
+        redact_pages(planner, doc, sink, digest, range(start, stop))
+        sink.save(chunk_path)
+    return ChunkResult(chunk_path, sink.stats, trace)
+
+
+def assemble_output(chunks, workdir: str, pdf_path: str) -> str:
+    """
+    Join the per-range results of redact_page_range into one PDF in workdir,
+    with the metadata and outline of the source at pdf_path, and return its
+    path. Parts are merged one at a time from disk.
+    """
+    output_path = os.path.join(workdir, "redacted.pdf")
+    with PageSink() as sink:
+        with stage("save"):
+            for chunk in chunks:
+                with fitz.open(chunk.path) as part:
+                    sink.add_document(part)
+        with fitz.open(pdf_path) as src:
+            sink.copy_info(src)
+        sink.save(output_path)
+    return output_path
+
+
+def report_output(name: str, pdf_path: str, output_path: str, chunks) -> EncodeStats:
+    """Log the input and output size of a document and how its page images were encoded."""
+    stats = EncodeStats()
+    for chunk in chunks:
+        stats.merge(chunk.stats)
+    stats.log(name, os.path.getsize(pdf_path), os.path.getsize(output_path))
+    return stats
+
+
+def count_pages(pdf_path: str) -> int:
+    with fitz.open(pdf_path) as doc:
+        return doc.page_count
+
+
+def document_key(digest: str) -> str:
+    """Cache key of a redacted document: input content plus everything that shapes the output."""
+    return hash_key(digest, "redact_pdf_bytes", planner.signature, output_signature())
 
-            draw = ImageDraw.Draw(img)
-            lines = {}
-            for i, word in enumerate(ocr_data["text"]):
-                if word.strip():
-                    y = ocr_data["top"][i]
-                    lines.setdefault(y, []).append((i, word))
-
-            for y, words in lines.items():
-                line_text = " ".join([w for _, w in words])
-                sensitive = get_sensitive_data([line_text])
-                for s in sensitive:
-                    for idx, w in words:
-                        if w in s:
-                            x, y, w_box, h = (
-                                ocr_data["left"][idx],
-                                ocr_data["top"][idx],
-                                ocr_data["width"][idx],
-                                ocr_data["height"][idx],
-                            )
-                            draw.rectangle([x, y, x + w_box, y + h], fill="black")
-            scanned_images.append(img)
-
-    # Convert redacted content to PDF bytes
-    output_buffer = io.BytesIO()
-    if scanned_images:
-        scanned_images[0].save(output_buffer, save_all=True, append_images=scanned_images[1:])
-    else:
-        doc.save(output_buffer)
-    return output_buffer.getvalue()
+
+def redact_file(pdf_path: str, workdir: str) -> str:
+    """Redact a spooled document in the current process and return the output path."""
+    digest = file_digest(pdf_path)
+    output_path = os.path.join(workdir, "redacted.pdf")
+    if not cache.copy_to("documents", document_key(digest), output_path):
+        chunks = [redact_page_range(pdf_path, workdir, digest, 0, count_pages(pdf_path))]
+        output_path = assemble_output(chunks, workdir, pdf_path)
+        report_output(pdf_path, pdf_path, output_path, chunks)
+        cache.put_file("documents", document_key(digest), output_path)
+    return output_path
+
+
+def redact_pdf_bytes(pdf_bytes: bytes) -> bytes:
+    """Redact a whole document in the current process."""
+    workdir = make_workdir()
+    try:
+        pdf_path = spool_upload(io.BytesIO(pdf_bytes), workdir)
+        with open(redact_file(pdf_path, workdir), "rb") as f:
+            return f.read()
+    finally:
+        remove_workdir(workdir)
 
 # ---------------------
 # FastAPI endpoints
 # ---------------------
+# Memory per request is bounded by the pages being worked on, not the file
+# size: the upload is spooled to disk in REDACT_COPY_CHUNK_SIZE pieces, a
+# worker holds one page's rasters at a time, and the merged output is
+# streamed from disk. Before any page is rendered, a document is sized from
+# its page boxes and admitted against the shared page and memory budgets of
+# admission.py; /redact/ and /plan/ answer 429 when there is no room in time.
+page_pool = PagePool(initializer=warm_up, budget=memory)
+
+
+async def map_document(func, args: tuple, pdf_path: str, wait: float = None, job: Job = None) -> list:
+    """
+    Run func(*args, start, stop) over the page chunks of a spooled document
+    on the page pool once the document is admitted, waiting up to `wait`
+    seconds for room (None: as long as it takes). Returns the chunk results.
+    """
+    estimate = await asyncio.to_thread(estimate_document, pdf_path, OCR_DPI)
+    if job is not None:
+        job.pages_total = estimate.pages
+    async with pending_pages.reserve(estimate.pages, wait):
+        return await map_admitted(func, args, estimate, job)
+
+
+async def map_admitted(func, args: tuple, estimate: DocumentEstimate, job: Job = None) -> list:
+    """map_document for a document whose pages are already reserved from pending_pages."""
+    pages_left = estimate.pages
+
+    def progress(pages: int):
+        nonlocal pages_left
+        pages_left -= pages
+        PAGES_IN_FLIGHT.dec(pages)
+        if job is not None:
+            job.advance(pages)
+
+    PAGES_IN_FLIGHT.inc(estimate.pages)
+    try:
+        chunks = await page_pool.map_pages(func, args, estimate.pages, progress, estimate.chunk_bytes)
+    finally:
+        PAGES_IN_FLIGHT.dec(pages_left)
+    for chunk in chunks:
+        # Page metrics were recorded in the worker processes
+        absorb(chunk.trace)
+    return chunks
+
+
+async def redact_spooled(pdf_path: str, workdir: str, name: str, job: Job = None,
+                         estimate: DocumentEstimate = None, source: str = None) -> str:
+    """
+    Redact a spooled upload on the page pool and return the output path.
+    Repeat uploads are served straight from the result cache. Raises
+    AdmissionError if an API request is not admitted within
+    REDACT_ADMISSION_WAIT; jobs wait for room. Documents of a batch were
+    admitted with the batch and come with their estimate.
+    """
+    source = source or ("api" if job is None else "job")
+    with DOCUMENT_SECONDS.time(source=source):
+        try:
+            output_path = await _redact_spooled(pdf_path, workdir, name, job, estimate)
+        except AdmissionError:
+            DOCUMENTS.inc(result="rejected")
+            raise
+        except Exception:
+            DOCUMENTS.inc(result="failed")
+            raise
+    return output_path
+
+
+async def _redact_spooled(pdf_path: str, workdir: str, name: str, job: Job = None,
+                          estimate: DocumentEstimate = None) -> str:
+    digest = await asyncio.to_thread(file_digest, pdf_path)
+    key = document_key(digest)
+    output_path = os.path.join(workdir, "redacted.pdf")
+    if await asyncio.to_thread(cache.copy_to, "documents", key, output_path):
+        if job is not None:
+            job.pages_total = job.pages_done = await asyncio.to_thread(count_pages, output_path)
+        DOCUMENTS.inc(result="cached")
+        return output_path
+
+    args = (pdf_path, workdir, digest)
+    if estimate is not None:
+        chunks = await map_admitted(redact_page_range, args, estimate, job)
+    else:
+        wait = ADMISSION_WAIT if job is None else None
+        chunks = await map_document(redact_page_range, args, pdf_path, wait, job)
+    output_path = await asyncio.to_thread(assemble_output, chunks, workdir, pdf_path)
+    stats = await asyncio.to_thread(report_output, name, pdf_path, output_path, chunks)
+    if job is not None:
+        job.encoding = stats.to_dict()
+    await asyncio.to_thread(cache.put_file, "documents", key, output_path)
+    DOCUMENTS.inc(result="redacted")
+    return output_path
+
+
+async def plan_spooled(pdf_path: str) -> DocumentPlan:
+    """
+    Plan a spooled upload on the page pool without redacting it. Plans are
+    cached per page, so redacting the document afterwards skips detection.
+    """
+    digest = await asyncio.to_thread(file_digest, pdf_path)
+    chunks = await map_document(plan_page_range, (pdf_path, digest), pdf_path, ADMISSION_WAIT)
+    return DocumentPlan([page for chunk in chunks for page in chunk.pages])
+
+
+def busy_response(error: AdmissionError) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(error), headers={"Retry-After": str(error.retry_after)})
+
+
+NOT_A_PDF = "Not a readable PDF"
+
+
+def invalid_pdf_response() -> HTTPException:
+    return HTTPException(status_code=400, detail=NOT_A_PDF)
+
+
+def trace_headers(name: str, trace: Trace) -> dict:
+    """Report a request's stage breakdown as REDACT_TRACE asks: a Server-Timing header or a log record."""
+    if REDACT_TRACE == "header":
+        timing = trace.server_timing()
+        return {"Server-Timing": timing} if timing else {}
+    if REDACT_TRACE == "log":
+        logger.info("%s: trace %s", name, json.dumps(trace.summary()))
+    return {}
+
+
+async def run_job(job: Job) -> str:
+    try:
+        with tracing() as trace:
+            output_path = await redact_spooled(job.pdf_path, job.workdir, job.filename, job)
+    except fitz.FileDataError:
+        raise JobError(NOT_A_PDF)
+    trace_headers(job.filename, trace)
+    job.pages_done = job.pages_total
+    return output_path
+
+
+job_queue = JobQueue(run_job)
+
+
+@app.on_event("startup")
+def start_job_queue():
+    job_queue.start()
+
+
+@app.on_event("shutdown")
+async def shutdown_page_pool():
+    await job_queue.stop()
+    page_pool.shutdown()
+
+
 @app.post("/redact/")
 async def redact_endpoint(file: UploadFile = File(...)):
-    pdf_bytes = await file.read()
-    redacted_bytes = redact_pdf_bytes(pdf_bytes)
+    workdir = make_workdir()
+    try:
+        with IN_FLIGHT.track(endpoint="redact"), tracing() as trace:
+            pdf_path = await asyncio.to_thread(spool_upload, file.file, workdir)
+            output_path = await redact_spooled(pdf_path, workdir, file.filename)
+    except AdmissionError as e:
+        remove_workdir(workdir)
+        raise busy_response(e)
+    except fitz.FileDataError:
+        remove_workdir(workdir)
+        raise invalid_pdf_response()
+    except BaseException:
+        remove_workdir(workdir)
+        raise
     return StreamingResponse(
-        io.BytesIO(redacted_bytes),
+        iter_file(output_path, workdir),
         media_type="application/pdf",
-        headers={"Content-Disposition": f"attachment; filename=redacted_{file.filename}"}
+        headers={
+            "Content-Disposition": f"attachment; filename=redacted_{file.filename}",
+            **trace_headers(file.filename, trace),
+        }
+    )
+
+
+@app.post("/plan/")
+async def plan_endpoint(file: UploadFile = File(...), text: bool = False):
+    """
+    Dry run of /redact/: the PII that would be removed from each page, with
+    categories, offsets and boxes, as JSON. text=true adds the page text.
+    """
+    workdir = make_workdir()
+    try:
+        with IN_FLIGHT.track(endpoint="plan"), tracing() as trace:
+            pdf_path = await asyncio.to_thread(spool_upload, file.file, workdir)
+            plan = await plan_spooled(pdf_path)
+    except AdmissionError as e:
+        raise busy_response(e)
+    except fitz.FileDataError:
+        raise invalid_pdf_response()
+    finally:
+        remove_workdir(workdir)
+    return JSONResponse(plan.to_dict(include_text=text), headers=trace_headers(file.filename, trace))
+
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    statuses = [job.status for job in list(job_queue.jobs.values())]
+    for status in ("queued", "running", "done", "failed"):
+        JOBS.set(statuses.count(status), status=status)
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+
+# ---------------------
+# Job endpoints for large documents
+# ---------------------
+@app.post("/jobs/", status_code=202)
+async def submit_job(file: UploadFile = File(...)):
+    workdir = make_workdir()
+    try:
+        pdf_path = await asyncio.to_thread(spool_upload, file.file, workdir)
+        job = job_queue.submit(Job(filename=file.filename, pdf_path=pdf_path, workdir=workdir))
+    except QueueFullError as e:
+        remove_workdir(workdir)
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "30"})
+    except BaseException:
+        remove_workdir(workdir)
+        raise
+    return job.to_dict()
+
+
+def get_job_or_404(job_id: str) -> Job:
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job
+
+
+@app.get("/jobs/{job_id}")
+async def job_status(job_id: str):
+    return get_job_or_404(job_id).to_dict()
+
+
+@app.get("/jobs/{job_id}/result")
+async def job_result(job_id: str):
+    job = get_job_or_404(job_id)
+    if job.status != "done":
+        raise HTTPException(status_code=409, detail=f"Job is {job.status}")
+    return StreamingResponse(
+        iter_file(job.output_path),
+        media_type="application/pdf",
+        headers={"Content-Disposition": f"attachment; filename=redacted_{job.filename}"}
+    )
+
+
+# ---------------------
+# Batch endpoint
+# ---------------------
+# A batch is admitted as a whole against the page budget, then its documents
+# run BATCH_CONCURRENCY at a time with their pages taking turns on the page
+# pool, and each redacted document is added to the streamed zip as soon as
+# it is done.
+class BatchResult(NamedTuple):
+    index: int        # position of the document in the batch
+    output_path: str  # None if it failed
+    error: str = None
+
+
+def estimate_batch_document(pdf_path: str):
+    """The DocumentEstimate of a batch document, or None if it is not a readable PDF."""
+    try:
+        return estimate_document(pdf_path, OCR_DPI)
+    except fitz.FileDataError:
+        return None
+
+
+async def redact_batch_document(document: BatchDocument, index: int, estimate: DocumentEstimate, workdir: str,
+                                turns: asyncio.Semaphore) -> BatchResult:
+    if estimate is None:
+        DOCUMENTS.inc(result="failed")
+        return BatchResult(index, None, NOT_A_PDF)
+    document_dir = os.path.join(workdir, f"document-{index:04d}")
+    os.makedirs(document_dir)
+    async with turns:
+        try:
+            output_path = await redact_spooled(
+                document.pdf_path, document_dir, document.name, estimate=estimate, source="batch"
+            )
+        except Exception:
+            logger.exception("%s: batch document failed", document.name)
+            return BatchResult(index, None, JOB_FAILED)
+    return BatchResult(index, output_path)
+
+
+async def stream_batch(documents: List[BatchDocument], estimates: list, workdir: str, admission: AsyncExitStack):
+    """
+    Redact the documents of an admitted batch and yield a zip of the
+    outputs, in the order they finish, followed by manifest.json. Releases
+    the batch's admission and removes its work directory when done or when
+    the client goes away.
+    """
+    names = output_names(documents)
+    turns = asyncio.Semaphore(BATCH_CONCURRENCY)
+    tasks = [
+        asyncio.ensure_future(redact_batch_document(document, index, estimate, workdir, turns))
+        for index, (document, estimate) in enumerate(zip(documents, estimates))
+    ]
+    archive = ZipStream()
+    manifest = [
+        {"name": document.name, "output": None, "status": "failed", "error": None,
+         "pages": estimate.pages if estimate is not None else None}
+        for document, estimate in zip(documents, estimates)
+    ]
+    try:
+        with IN_FLIGHT.track(endpoint="batch"):
+            for finished in asyncio.as_completed(tasks):
+                result = await finished
+                entry = manifest[result.index]
+                if result.output_path is None:
+                    entry["error"] = result.error
+                    continue
+                pieces = archive.write_file(names[result.index], result.output_path)
+                while (piece := await asyncio.to_thread(next, pieces, None)) is not None:
+                    if piece:
+                        yield piece
+                entry.update(output=names[result.index], status="redacted")
+                remove_workdir(os.path.dirname(result.output_path))
+            yield archive.write_bytes("manifest.json", json.dumps({"documents": manifest}, indent=2).encode())
+            yield archive.close()
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        await admission.aclose()
+        remove_workdir(workdir)
+
+
+@app.post("/redact/batch/")
+async def redact_batch_endpoint(files: List[UploadFile] = File(...)):
+    """
+    Redact many documents in one request: any mix of PDFs and zip archives
+    of PDFs. Answers with a zip of redacted_<name> PDFs, each streamed as
+    soon as its document is done, ending with a manifest.json that lists
+    every document with its status.
+    """
+    workdir = make_workdir()
+    admission = AsyncExitStack()
+    documents = []
+    try:
+        documents = await asyncio.to_thread(spool_batch, [(f.file, f.filename) for f in files], workdir)
+        estimates = await asyncio.to_thread(lambda: [estimate_batch_document(d.pdf_path) for d in documents])
+        pages = sum(estimate.pages for estimate in estimates if estimate is not None)
+        await admission.enter_async_context(pending_pages.reserve(pages, ADMISSION_WAIT))
+    except BatchError as e:
+        remove_workdir(workdir)
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+    except AdmissionError as e:
+        DOCUMENTS.inc(len(documents), result="rejected")
+        remove_workdir(workdir)
+        raise busy_response(e)
+    except BaseException:
+        remove_workdir(workdir)
+        raise
+    return StreamingResponse(
+        stream_batch(documents, estimates, workdir, admission),
+        media_type="application/zip",
+        headers={"Content-Disposition": "attachment; filename=redacted.zip"},
     )
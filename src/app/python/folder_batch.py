@@ -0,0 +1,195 @@
+"""
+Folder-scale batch redaction.
+
+Finds PDFs under a folder recursively and redacts them across a process
+pool into a mirrored tree under the output folder. Every finished document
+is appended to a JSON-lines manifest in the output folder, so an
+interrupted run picks up where it stopped: documents whose input is
+unchanged (by size and mtime, or by SHA-256 with check="hash") and whose
+output was written with the same settings are skipped. A JSON summary
+report is written at the end of every run.
+"""
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from .cache import file_digest
+except ImportError:
+    from cache import file_digest
+
+MANIFEST_NAME = ".manifest.jsonl"
+REPORT_NAME = "report.json"
+CHECK_MODES = ("mtime", "hash")
+
+
+def discover(folder: str, exclude: str = None):
+    """Relative paths of every PDF under folder, sorted, skipping the exclude directory."""
+    exclude = os.path.abspath(exclude) if exclude else None
+    for root, dirs, files in os.walk(folder):
+        dirs[:] = sorted(d for d in dirs if os.path.join(os.path.abspath(root), d) != exclude)
+        for name in sorted(files):
+            if name.lower().endswith(".pdf"):
+                yield os.path.relpath(os.path.join(root, name), folder)
+
+
+def output_path_for(rel_path: str, output_folder: str) -> str:
+    return os.path.join(output_folder, os.path.splitext(rel_path)[0] + "_redacted.pdf")
+
+
+# ---------------------
+# Manifest
+# ---------------------
+def load_manifest(path: str) -> dict:
+    """Latest entry per input path. A line cut short by a crash is ignored."""
+    entries = {}
+    if not os.path.exists(path):
+        return entries
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            entries[entry["path"]] = entry
+    return entries
+
+
+def is_up_to_date(entry: dict, pdf_path: str, output_path: str, check: str, signature: str) -> bool:
+    if not os.path.exists(output_path):
+        return False
+    stat = os.stat(pdf_path)
+    if entry is None:
+        # Outputs from before the manifest existed: trust them if newer than the input
+        return check == "mtime" and os.stat(output_path).st_mtime_ns >= stat.st_mtime_ns
+    if entry.get("status") != "done" or entry.get("signature") != signature:
+        return False
+    if stat.st_size != entry.get("size"):
+        return False
+    if check == "hash":
+        return file_digest(pdf_path) == entry.get("sha256")
+    return stat.st_mtime_ns == entry.get("mtime_ns")
+
+
+def _redact_one(redact_file, pdf_path: str, output_path: str) -> dict:
+    """Run redact_file(pdf_path, output_path) in a pool worker, capturing errors and timing."""
+    start = time.perf_counter()
+    try:
+        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+        result = redact_file(pdf_path, output_path) or {}
+        result["status"] = "done"
+    except Exception as e:
+        result = {"status": "failed", "error": f"{type(e).__name__}: {e}"}
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    return result
+
+
+# ---------------------
+# Report
+# ---------------------
+def _add_counts(total: dict, counts: dict):
+    for key, count in (counts or {}).items():
+        total[key] = total.get(key, 0) + count
+
+
+def new_report(folder: str, output_folder: str) -> dict:
+    return {
+        "folder": os.path.abspath(folder),
+        "output_folder": os.path.abspath(output_folder),
+        "started_at": time.time(),
+        "seconds": 0.0,
+        "documents": {"found": 0, "redacted": 0, "skipped": 0, "failed": 0},
+        "pages": {},
+        "matches": {},
+        "input_bytes": 0,
+        "output_bytes": 0,
+        "failures": [],
+    }
+
+
+def add_to_report(report: dict, entry: dict):
+    if entry["status"] == "failed":
+        report["documents"]["failed"] += 1
+        report["failures"].append({"path": entry["path"], "error": entry["error"]})
+        return
+    report["documents"]["redacted"] += 1
+    _add_counts(report["pages"], entry.get("pages"))
+    _add_counts(report["matches"], entry.get("matches"))
+    report["input_bytes"] += entry.get("input_bytes", 0)
+    report["output_bytes"] += entry.get("output_bytes", 0)
+
+
+def write_report(report: dict, path: str):
+    report["seconds"] = round(time.time() - report["started_at"], 1)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+# ---------------------
+# Runner
+# ---------------------
+def run_folder_batch(
+    redact_file,
+    folder: str,
+    output_folder: str = None,
+    signature: str = "",
+    workers: int = None,
+    check: str = "mtime",
+    resume: bool = True,
+) -> dict:
+    """
+    Redact every PDF under folder with redact_file(pdf_path, output_path),
+    a picklable function returning a dict with "pages", "matches",
+    "input_bytes" and "output_bytes". signature identifies the redaction
+    settings; outputs written under a different signature are redone.
+    Returns the summary report, which is also written to output_folder.
+    """
+    if check not in CHECK_MODES:
+        raise ValueError(f"Unknown check mode {check!r}")
+    output_folder = output_folder or os.path.join(folder, "redacted")
+    os.makedirs(output_folder, exist_ok=True)
+    manifest_path = os.path.join(output_folder, MANIFEST_NAME)
+    manifest = load_manifest(manifest_path) if resume else {}
+    report = new_report(folder, output_folder)
+
+    pending = []
+    for rel_path in discover(folder, exclude=output_folder):
+        report["documents"]["found"] += 1
+        pdf_path = os.path.join(folder, rel_path)
+        output_path = output_path_for(rel_path, output_folder)
+        if resume and is_up_to_date(manifest.get(rel_path), pdf_path, output_path, check, signature):
+            report["documents"]["skipped"] += 1
+        else:
+            # Recorded as of before the run, so edits made while it runs are picked up next time
+            stat = os.stat(pdf_path)
+            digest = file_digest(pdf_path) if check == "hash" else None
+            pending.append((rel_path, pdf_path, output_path, stat, digest))
+
+    executor = ProcessPoolExecutor(max_workers=workers or os.cpu_count() or 1)
+    with open(manifest_path, "a" if resume else "w", encoding="utf-8") as manifest_file:
+        try:
+            futures = {
+                executor.submit(_redact_one, redact_file, pdf_path, output_path): (rel_path, stat, digest)
+                for rel_path, pdf_path, output_path, stat, digest in pending
+            }
+            for future in as_completed(futures):
+                rel_path, stat, digest = futures[future]
+                entry = {"path": rel_path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                         "signature": signature, "finished_at": time.time()}
+                if digest is not None:
+                    entry["sha256"] = digest
+                entry.update(future.result())
+                manifest_file.write(json.dumps(entry) + "\n")
+                manifest_file.flush()
+                add_to_report(report, entry)
+                if entry["status"] == "failed":
+                    print(f"{rel_path}: {entry['error']}", file=sys.stderr)
+        finally:
+            # On an interrupt, drop the queued documents; the manifest has the finished ones
+            executor.shutdown(cancel_futures=True)
+            write_report(report, os.path.join(output_folder, REPORT_NAME))
+    return report
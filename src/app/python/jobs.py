@@ -0,0 +1,147 @@
+import asyncio
+import logging
+import os
+import time
+import uuid
+from dataclasses import dataclass, field
+
+try:
+    from .spool import remove_workdir
+except ImportError:
+    from spool import remove_workdir
+
+logger = logging.getLogger(__name__)
+
+# ---------------------
+# Configuration
+# ---------------------
+# Jobs waiting to start. Submissions beyond this are rejected.
+JOB_QUEUE_SIZE = int(os.getenv("REDACT_JOB_QUEUE_SIZE", "32"))
+
+# Jobs processed at the same time. Their pages share the page pool.
+JOB_CONCURRENCY = int(os.getenv("REDACT_JOB_CONCURRENCY", "2"))
+
+# Seconds a finished job and its result are kept.
+JOB_TTL_SECONDS = int(os.getenv("REDACT_JOB_TTL_SECONDS", "3600"))
+
+
+# What GET /jobs/{id} reports for failures that are not a JobError. The
+# exception itself (which may name server paths) only goes to the log.
+JOB_FAILED = "Redaction failed"
+
+
+class QueueFullError(Exception):
+    pass
+
+
+class JobError(Exception):
+    """A job failure whose message is meant for the client, e.g. an upload that is not a PDF."""
+
+
+@dataclass
+class Job:
+    filename: str
+    pdf_path: str
+    workdir: str
+    id: str = field(default_factory=lambda: uuid.uuid4().hex)
+    status: str = "queued"  # queued -> running -> done | failed
+    pages_total: int = 0
+    pages_done: int = 0
+    output_path: str = None
+    error: str = None
+    encoding: dict = None  # page_output.EncodeStats of the result, unless it came from the cache
+    created_at: float = field(default_factory=time.time)
+    finished_at: float = None
+
+    def advance(self, pages: int):
+        self.pages_done += pages
+
+    @property
+    def expires_at(self):
+        return self.finished_at + JOB_TTL_SECONDS if self.finished_at else None
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "filename": self.filename,
+            "status": self.status,
+            "pages_done": self.pages_done,
+            "pages_total": self.pages_total,
+            "error": self.error,
+            "encoding": self.encoding,
+            "created_at": self.created_at,
+            "expires_at": self.expires_at,
+        }
+
+
+class JobQueue:
+    """
+    Bounded in-process job queue. `runner(job)` is awaited for every job by
+    JOB_CONCURRENCY worker tasks; it fills in pages_total/pages_done while
+    running and returns the output path. Only the message of a JobError is
+    reported to clients.
+    """
+
+    def __init__(self, runner, max_queued: int = JOB_QUEUE_SIZE, concurrency: int = JOB_CONCURRENCY):
+        self.runner = runner
+        self.max_queued = max_queued
+        self.concurrency = concurrency
+        self.jobs = {}
+        self._queue = None
+        self._tasks = []
+
+    def start(self):
+        self._queue = asyncio.Queue(maxsize=self.max_queued)
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.concurrency)]
+        self._tasks.append(asyncio.create_task(self._reaper()))
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for job in list(self.jobs.values()):
+            self._remove(job)
+
+    def submit(self, job: Job) -> Job:
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise QueueFullError(f"{self.max_queued} jobs already queued")
+        self.jobs[job.id] = job
+        return job
+
+    def get(self, job_id: str):
+        return self.jobs.get(job_id)
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            job.status = "running"
+            try:
+                job.output_path = await self.runner(job)
+                job.status = "done"
+            except asyncio.CancelledError:
+                raise
+            except JobError as e:
+                job.status = "failed"
+                job.error = str(e)
+            except Exception:
+                logger.exception("job %s (%s) failed", job.id, job.filename)
+                job.status = "failed"
+                job.error = JOB_FAILED
+            finally:
+                job.finished_at = time.time()
+                self._queue.task_done()
+
+    async def _reaper(self):
+        while True:
+            await asyncio.sleep(min(60, JOB_TTL_SECONDS))
+            now = time.time()
+            for job in list(self.jobs.values()):
+                if job.expires_at is not None and job.expires_at <= now:
+                    self._remove(job)
+
+    def _remove(self, job: Job):
+        self.jobs.pop(job.id, None)
+        remove_workdir(job.workdir)
@@ -0,0 +1,267 @@
+"""
+In-process metrics in the Prometheus text format.
+
+Counters, gauges and histograms are declared once at module level and
+recorded into the process-wide `registry`, which the API serves on
+/metrics. Pool workers record into their own registry; a worker wraps its
+task in tracing() and returns the Trace, and the API process absorb()s it so
+page-level work shows up in the API process registry and in the request's
+trace. A trace holds only what happened while it was active, so it doubles
+as the per-request stage breakdown.
+
+Recording costs a lock and a few dict updates, cheap enough to stay on.
+"""
+import bisect
+import contextvars
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# "header" adds a Server-Timing header with the stage breakdown to /redact/
+# responses, "log" writes it as a log record per document, "none" turns
+# per-request traces off. The /metrics registry is always recorded.
+REDACT_TRACE = os.getenv("REDACT_TRACE", "none")
+
+STAGE_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+DOCUMENT_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+
+_METRICS = {}
+_active_trace = contextvars.ContextVar("redact_trace", default=None)
+
+
+class Registry:
+    """Values of every declared metric, keyed by (name, label values)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values = {}      # counters and gauges
+        self.histograms = {}  # [bucket counts..., +Inf count], sum
+
+    def __getstate__(self):
+        return {"values": self.values, "histograms": self.histograms}
+
+    def __setstate__(self, state):
+        self.__init__()
+        self.values = state["values"]
+        self.histograms = state["histograms"]
+
+    def _add(self, key, amount):
+        with self._lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def _set(self, key, value):
+        with self._lock:
+            self.values[key] = value
+
+    def _observe(self, key, buckets, value):
+        with self._lock:
+            entry = self.histograms.get(key)
+            if entry is None:
+                entry = self.histograms[key] = [[0] * (len(buckets) + 1), 0.0]
+            entry[0][bisect.bisect_left(buckets, value)] += 1
+            entry[1] += value
+
+    def merge(self, other: "Registry"):
+        """Add the counters and histograms of another registry (gauges are per process)."""
+        with self._lock:
+            for key, value in other.values.items():
+                if _METRICS[key[0]].kind == "counter":
+                    self.values[key] = self.values.get(key, 0) + value
+            for key, (counts, total) in other.histograms.items():
+                entry = self.histograms.get(key)
+                if entry is None:
+                    entry = self.histograms[key] = [[0] * len(counts), 0.0]
+                entry[0] = [a + b for a, b in zip(entry[0], counts)]
+                entry[1] += total
+
+    def render(self) -> str:
+        """The registry in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            for name, metric in _METRICS.items():
+                lines.append(f"# HELP {name} {metric.help}")
+                lines.append(f"# TYPE {name} {metric.kind}")
+                if metric.kind == "histogram":
+                    for (key_name, labels), (counts, total) in sorted(self.histograms.items()):
+                        if key_name != name:
+                            continue
+                        cumulative = 0
+                        for bound, count in zip(metric.buckets + ("+Inf",), counts):
+                            cumulative += count
+                            bucket_labels = labels + (("le", str(bound)),)
+                            lines.append(f"{name}_bucket{_format(bucket_labels)} {cumulative}")
+                        lines.append(f"{name}_sum{_format(labels)} {total}")
+                        lines.append(f"{name}_count{_format(labels)} {cumulative}")
+                else:
+                    for (key_name, labels), value in sorted(self.values.items()):
+                        if key_name == name:
+                            lines.append(f"{name}{_format(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+
+def _format(labels) -> str:
+    if not labels:
+        return ""
+    pairs = (f'{key}="{_escape(value)}"' for key, value in labels)
+    return "{" + ",".join(pairs) + "}"
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+registry = Registry()
+
+
+class Trace(Registry):
+    """Metrics recorded while a tracing() block was active."""
+
+    def stage_seconds(self) -> dict:
+        return {
+            dict(labels)["stage"]: total
+            for (name, labels), (_, total) in self.histograms.items()
+            if name == STAGE_SECONDS.name
+        }
+
+    def summary(self) -> dict:
+        """Stage milliseconds, pages by kind and matches by category, e.g. for a log record."""
+        def counts(metric):
+            return {
+                dict(labels)[metric.labelnames[0]]: value
+                for (name, labels), value in self.values.items()
+                if name == metric.name
+            }
+        return {
+            "stages_ms": {name: round(seconds * 1000, 1) for name, seconds in self.stage_seconds().items()},
+            "pages": counts(PAGES),
+            "matches": counts(MATCHES),
+        }
+
+    def server_timing(self) -> str:
+        """Stage totals as a Server-Timing header value (summed over workers, so they can exceed wall time)."""
+        return ", ".join(f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in sorted(self.stage_seconds().items()))
+
+
+def _targets():
+    trace = _active_trace.get()
+    return (registry,) if trace is None else (registry, trace)
+
+
+# ---------------------
+# Metric types
+# ---------------------
+class Metric:
+    kind = None
+
+    def __init__(self, name: str, help: str, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        _METRICS[name] = self
+
+    def _key(self, labels: dict):
+        return self.name, tuple((label, labels[label]) for label in self.labelnames)
+
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        for target in _targets():
+            target._add(key, amount)
+
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def inc(self, amount: float = 1, **labels):
+        registry._add(self._key(labels), amount)
+
+    def dec(self, amount: float = 1, **labels):
+        registry._add(self._key(labels), -amount)
+
+    def set(self, value: float, **labels):
+        registry._set(self._key(labels), value)
+
+    @contextmanager
+    def track(self, **labels):
+        """Count the block as in progress while it runs."""
+        self.inc(**labels)
+        try:
+            yield
+        finally:
+            self.dec(**labels)
+
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, help: str, labelnames=(), buckets=STAGE_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        for target in _targets():
+            target._observe(key, self.buckets, value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+
+# ---------------------
+# Pipeline metrics
+# ---------------------
+STAGE_SECONDS = Histogram("redact_stage_seconds", "Time spent per pipeline stage.", ["stage"])
+DOCUMENT_SECONDS = Histogram(
+    "redact_document_seconds", "Time to redact a document end to end.", ["source"], DOCUMENT_BUCKETS
+)
+PAGES = Counter("redact_pages_total", "Pages redacted, by page kind.", ["kind"])
+MATCHES = Counter("redact_pii_matches_total", "PII matches redacted, by category.", ["category"])
+DOCUMENTS = Counter(
+    "redact_documents_total", "Documents handled, by result (redacted, cached, rejected, failed).", ["result"]
+)
+IN_FLIGHT = Gauge("redact_requests_in_flight", "Requests being handled, by endpoint.", ["endpoint"])
+PAGES_IN_FLIGHT = Gauge("redact_pages_in_flight", "Pages submitted to the page pool and not finished.")
+JOBS = Gauge("redact_jobs", "Background jobs, by status.", ["status"])
+ADMISSION_RESERVED = Gauge(
+    "redact_admission_reserved", "Reserved admission budget: pages admitted, estimated page pool bytes.", ["budget"]
+)
+
+
+def stage(name: str):
+    """Time a block as one pipeline stage: `with stage("render"): ...`"""
+    return STAGE_SECONDS.time(stage=name)
+
+
+def count_matches(matches):
+    """Count PII matches by category."""
+    for match in matches:
+        MATCHES.inc(category=match.category)
+
+
+@contextmanager
+def tracing():
+    """Collect the metrics recorded inside the block (in this context) into a Trace."""
+    outer = _active_trace.get()
+    trace = Trace()
+    token = _active_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _active_trace.reset(token)
+        if outer is not None:
+            outer.merge(trace)
+
+
+def absorb(trace: Trace):
+    """Fold a Trace returned by a pool worker into this process's registry and active trace."""
+    for target in _targets():
+        target.merge(trace)
@@ -0,0 +1,188 @@
+import logging
+import os
+import re
+import threading
+
+import pytesseract
+from PIL import Image
+
+try:
+    from .cache import cache, hash_key
+except ImportError:
+    from cache import cache, hash_key
+
+logger = logging.getLogger(__name__)
+
+OCR_CONFIG = "--oem 1 --psm 3"
+
+# "pytesseract" runs the tesseract binary per call; "tesserocr" keeps a warm
+# engine per worker thread with the model loaded once; "auto" uses tesserocr
+# when it is installed.
+OCR_BACKEND = os.getenv("OCR_BACKEND", "pytesseract")
+OCR_LANG = os.getenv("OCR_LANG", "eng")
+
+# The tesseract binary the pytesseract backend runs (default: the one on
+# PATH), e.g. C:\Program Files\Tesseract-OCR\tesseract.exe on Windows.
+TESSERACT_CMD = os.getenv("TESSERACT_CMD", "tesseract")
+pytesseract.pytesseract.tesseract_cmd = TESSERACT_CMD
+
+# tesserocr installs signal handlers on import, which only works on the main
+# thread, while the first OCR call often comes from a worker thread.
+tesserocr = None
+if OCR_BACKEND in ("tesserocr", "auto"):
+    try:
+        import tesserocr
+    except ImportError:
+        pass
+
+DATA_KEYS = ["level", "page_num", "block_num", "par_num", "line_num", "word_num",
+             "left", "top", "width", "height", "conf", "text"]
+
+
+def parse_config(config: str):
+    """Pull (oem, psm) out of a tesseract command line config."""
+    oem = re.search(r"--oem\s+(\d+)", config)
+    psm = re.search(r"--psm\s+(\d+)", config)
+    return int(oem.group(1)) if oem else 3, int(psm.group(1)) if psm else 3
+
+
+# ---------------------
+# Backends
+# ---------------------
+class PytesseractBackend:
+    """Forks the tesseract binary for every call."""
+
+    name = "pytesseract"
+
+    def image_to_data(self, img: Image.Image, config: str) -> dict:
+        return pytesseract.image_to_data(img, lang=OCR_LANG, output_type=pytesseract.Output.DICT, config=config)
+
+    def image_to_string(self, img: Image.Image, config: str) -> str:
+        return pytesseract.image_to_string(img, lang=OCR_LANG, config=config)
+
+
+class TesserocrBackend:
+    """
+    Long-lived Tesseract engines through the tesserocr C API binding. Each
+    thread gets its own engine per OCR engine mode, initialised on first use
+    and reused for every page, and images are handed over in memory.
+    """
+
+    name = "tesserocr"
+
+    def __init__(self):
+        if tesserocr is None:
+            raise ImportError("tesserocr is not installed")
+        self.tesserocr = tesserocr
+        self._local = threading.local()
+
+    def _api(self, config: str):
+        oem, psm = parse_config(config)
+        engines = getattr(self._local, "engines", None)
+        if engines is None:
+            engines = self._local.engines = {}
+        api = engines.get(oem)
+        if api is None:
+            kwargs = {"lang": OCR_LANG, "oem": oem}
+            if os.getenv("TESSDATA_PREFIX"):
+                kwargs["path"] = os.getenv("TESSDATA_PREFIX")
+            api = engines[oem] = self.tesserocr.PyTessBaseAPI(**kwargs)
+        api.SetPageSegMode(psm)
+        return api
+
+    def image_to_string(self, img: Image.Image, config: str) -> str:
+        api = self._api(config)
+        api.SetImage(img)
+        try:
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+
+    def image_to_data(self, img: Image.Image, config: str) -> dict:
+        """Word boxes in the same dict layout as pytesseract's Output.DICT (word rows only)."""
+        RIL = self.tesserocr.RIL
+        api = self._api(config)
+        api.SetImage(img)
+        ocr_data = {key: [] for key in DATA_KEYS}
+        try:
+            api.Recognize()
+            iterator = api.GetIterator()
+            block = par = line = word = 0
+            while iterator is not None:
+                if iterator.IsAtBeginningOf(RIL.BLOCK):
+                    block, par, line, word = block + 1, 0, 0, 0
+                if iterator.IsAtBeginningOf(RIL.PARA):
+                    par, line, word = par + 1, 0, 0
+                if iterator.IsAtBeginningOf(RIL.TEXTLINE):
+                    line, word = line + 1, 0
+                word += 1
+                box = iterator.BoundingBox(RIL.WORD)
+                if box is not None:
+                    left, top, right, bottom = box
+                    row = [5, 1, block, par, line, word, left, top, right - left, bottom - top,
+                           iterator.Confidence(RIL.WORD), iterator.GetUTF8Text(RIL.WORD) or ""]
+                    for key, value in zip(DATA_KEYS, row):
+                        ocr_data[key].append(value)
+                if not iterator.Next(RIL.WORD):
+                    break
+        finally:
+            api.Clear()
+        return ocr_data
+
+
+_backend = None
+
+
+def get_backend():
+    """The configured OCR backend, falling back to pytesseract if tesserocr is missing."""
+    global _backend
+    if _backend is None:
+        if OCR_BACKEND in ("tesserocr", "auto"):
+            try:
+                _backend = TesserocrBackend()
+            except ImportError:
+                if OCR_BACKEND == "tesserocr":
+                    logger.warning("tesserocr is not installed, falling back to pytesseract")
+        if _backend is None:
+            _backend = PytesseractBackend()
+    return _backend
+
+
+def warm_up(config: str = OCR_CONFIG):
+    """Load the OCR engine ahead of the first page, e.g. as a pool worker initializer."""
+    backend = get_backend()
+    if isinstance(backend, TesserocrBackend):
+        backend._api(config)
+
+
+def ocr_signature(config: str = OCR_CONFIG) -> str:
+    """Backend, language and config, for cache keys."""
+    return f"{get_backend().name}:{OCR_LANG}:{config}"
+
+
+# ---------------------
+# Cached OCR calls
+# ---------------------
+def image_key(img: Image.Image, *config) -> str:
+    """Cache key for OCR output of an image: its pixels plus the OCR settings."""
+    return hash_key(*config, img.mode, f"{img.width}x{img.height}", img.tobytes())
+
+
+def image_to_data(img: Image.Image, config: str = OCR_CONFIG) -> dict:
+    """Word table of an image as a dict of lists (pytesseract Output.DICT layout), cached per page image."""
+    key = image_key(img, "data", ocr_signature(config))
+    ocr_data = cache.get_json("ocr", key)
+    if ocr_data is None:
+        ocr_data = get_backend().image_to_data(img, config)
+        cache.put_json("ocr", key, ocr_data)
+    return ocr_data
+
+
+def image_to_string(img: Image.Image, config: str = OCR_CONFIG) -> str:
+    """Text of an image, cached per page image."""
+    key = image_key(img, "string", ocr_signature(config))
+    text = cache.get_json("ocr", key)
+    if text is None:
+        text = get_backend().image_to_string(img, config)
+        cache.put_json("ocr", key, text)
+    return text
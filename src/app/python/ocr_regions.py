@@ -0,0 +1,183 @@
+"""
+Region-of-interest OCR for scanned pages.
+
+A grayscale probe render at render.PROBE_DPI (1 px = 1 pt) is thresholded
+against its background and cut into ink regions with a recursive XY-cut:
+the page is split at every horizontal, then vertical, band of background at
+least ROI_MIN_GAP_PT wide, until no band splits a region any more. Only
+those regions, padded by ROI_PADDING_PT, are rendered at the OCR resolution
+(get_pixmap with a clip, which is pixel for pixel the same as cropping a
+full render) and sent to OCR, so blank margins, gutters and the space
+between paragraphs cost nothing. The word tables of the regions are merged
+back into one page table in page pixel coordinates, with each region its
+own set of blocks.
+
+Pages where regions would cover more than ROI_MAX_COVERAGE of the page,
+dark (inverted) scans and rotated pages are OCRed whole: find_text_regions
+returns None for them.
+"""
+import logging
+import os
+import time
+from typing import List, Optional
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+
+try:
+    from .metrics import STAGE_SECONDS, stage
+    from .ocr import DATA_KEYS, image_to_data
+    from .preprocess import preprocess_image
+    from .render import PROBE_DPI
+except ImportError:
+    from metrics import STAGE_SECONDS, stage
+    from ocr import DATA_KEYS, image_to_data
+    from preprocess import preprocess_image
+    from render import PROBE_DPI
+
+logger = logging.getLogger(__name__)
+
+# ---------------------
+# Configuration
+# ---------------------
+# "on" OCRs only the ink regions of scanned pages; "off" OCRs whole pages.
+OCR_REGIONS = os.getenv("OCR_REGIONS", "off")
+
+# Background bands at least this wide (points) separate regions. Wider than
+# word spacing and line spacing, narrower than paragraph and column gaps.
+ROI_MIN_GAP_PT = int(os.getenv("ROI_MIN_GAP_PT", "12"))
+
+# Background kept around each region, so OCR sees the edges of the glyphs.
+ROI_PADDING_PT = int(os.getenv("ROI_PADDING_PT", "4"))
+
+# Share of the page above which regions save too little to be worth it.
+ROI_MAX_COVERAGE = float(os.getenv("ROI_MAX_COVERAGE", "0.8"))
+
+# Gray levels below the page background that count as ink in the probe.
+ROI_INK_CONTRAST = int(os.getenv("ROI_INK_CONTRAST", "40"))
+
+# Regions shorter than this (points) are specks, not text.
+ROI_MIN_HEIGHT_PT = 4
+
+
+def regions_signature() -> str:
+    """Everything that changes which regions are OCRed, for cache keys."""
+    if OCR_REGIONS != "on":
+        return "off"
+    return f"{ROI_MIN_GAP_PT}:{ROI_PADDING_PT}:{ROI_MAX_COVERAGE}:{ROI_INK_CONTRAST}:{ROI_MIN_HEIGHT_PT}"
+
+
+# ---------------------
+# Finding regions
+# ---------------------
+def _runs(profile: np.ndarray, min_gap: int) -> list:
+    """(start, stop) of the runs of ink in a profile, bridging gaps narrower than min_gap."""
+    ink = np.flatnonzero(profile)
+    if not ink.size:
+        return []
+    breaks = np.flatnonzero(np.diff(ink) > min_gap)
+    starts = np.concatenate(([ink[0]], ink[breaks + 1]))
+    stops = np.concatenate((ink[breaks], [ink[-1]])) + 1
+    return list(zip(starts.tolist(), stops.tolist()))
+
+
+def xy_cut(mask: np.ndarray, min_gap: int) -> List[tuple]:
+    """
+    Ink regions of a boolean mask as (x0, y0, x1, y1) pixel boxes in reading
+    order: top to bottom, then left to right within a band.
+    """
+    regions = []
+    stack = [(0, 0, mask.shape[1], mask.shape[0])]
+    while stack:
+        x0, y0, x1, y1 = stack.pop()
+        block = mask[y0:y1, x0:x1]
+        rows = _runs(block.any(axis=1), min_gap)
+        if len(rows) > 1:
+            stack.extend((x0, y0 + start, x1, y0 + stop) for start, stop in reversed(rows))
+            continue
+        columns = _runs(block.any(axis=0), min_gap)
+        if len(columns) > 1:
+            stack.extend((x0 + start, y0, x0 + stop, y1) for start, stop in reversed(columns))
+            continue
+        if rows:
+            (top, bottom), (left, right) = rows[0], columns[0]
+            regions.append((x0 + left, y0 + top, x0 + right, y0 + bottom))
+    return regions
+
+
+def find_text_regions(page) -> Optional[List[fitz.Rect]]:
+    """
+    Padded ink regions of a scanned page in page coordinates, [] if the page
+    is blank, or None if the whole page should be OCRed.
+    """
+    if page.rotation:
+        return None
+    pix = page.get_pixmap(dpi=PROBE_DPI, colorspace=fitz.csGRAY)
+    pixels = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    background = float(np.median(pixels))
+    if background < 128:
+        return None
+    mask = pixels < background - ROI_INK_CONTRAST
+
+    scale = 72 / PROBE_DPI
+    origin = page.rect.tl
+    regions = []
+    covered = 0.0
+    for x0, y0, x1, y1 in xy_cut(mask, int(ROI_MIN_GAP_PT / scale)):
+        if (y1 - y0) * scale < ROI_MIN_HEIGHT_PT:
+            continue
+        rect = fitz.Rect(x0 * scale, y0 * scale, x1 * scale, y1 * scale) + (origin.x, origin.y, origin.x, origin.y)
+        rect = (rect + (-ROI_PADDING_PT, -ROI_PADDING_PT, ROI_PADDING_PT, ROI_PADDING_PT)) & page.rect
+        regions.append(rect)
+        covered += rect.get_area()
+    if covered > ROI_MAX_COVERAGE * page.rect.get_area():
+        return None
+    return regions
+
+
+# ---------------------
+# OCR of regions
+# ---------------------
+def ocr_regions(page, regions: List[fitz.Rect], dpi: int) -> dict:
+    """
+    OCR the regions of a page at dpi. Returns one image_to_data dict with
+    boxes in pixels of a full-page render at dpi and block numbers unique
+    across regions.
+    """
+    # Pixel origin of a full-page render, which clip renders are offset from
+    full = fitz.Rect(page.rect) * fitz.Matrix(dpi / 72, dpi / 72)
+    origin_x, origin_y = full.irect.x0, full.irect.y0
+    merged = {key: [] for key in DATA_KEYS}
+    blocks = 0
+    ocr_seconds = 0.0
+    for rect in regions:
+        with stage("render"):
+            pix = page.get_pixmap(dpi=dpi, clip=rect, colorspace=fitz.csGRAY)
+            img = Image.frombytes("L", [pix.width, pix.height], pix.samples)
+        img_preprocessed = preprocess_image(img)
+        del img
+        start = time.perf_counter()
+        data = image_to_data(img_preprocessed)
+        elapsed = time.perf_counter() - start
+        STAGE_SECONDS.observe(elapsed, stage="ocr")
+        ocr_seconds += elapsed
+        del img_preprocessed
+
+        dx, dy = pix.x - origin_x, pix.y - origin_y
+        for key in DATA_KEYS:
+            values = data[key]
+            if key == "left":
+                values = [value + dx for value in values]
+            elif key == "top":
+                values = [value + dy for value in values]
+            elif key == "block_num":
+                values = [value + blocks for value in values]
+            merged[key].extend(values)
+        blocks = max(merged["block_num"], default=blocks) + 1
+    coverage = sum(rect.get_area() for rect in regions) / page.rect.get_area()
+    logger.info(
+        "page %d: OCR of %d regions (%.0f%% of the page) at %d dpi took %.0f ms",
+        page.number + 1, len(regions), coverage * 100, dpi, ocr_seconds * 1000,
+    )
+    return merged
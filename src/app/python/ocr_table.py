@@ -0,0 +1,160 @@
+from typing import Iterator, List, NamedTuple, Tuple
+
+import numpy as np
+
+try:
+    from .pii import PiiMatch
+except ImportError:
+    from pii import PiiMatch
+
+
+class TextUnit(NamedTuple):
+    """A line or block of OCR words joined with single spaces."""
+    text: str
+    words: np.ndarray   # indices into the table, in reading order
+    starts: np.ndarray  # offset of each word in text
+    ends: np.ndarray
+
+
+class OcrTable:
+    """
+    OCR word table stored column-wise in arrays. Lines come from Tesseract's
+    block/par/line numbering when present, otherwise from a sweep over the
+    word boxes sorted by vertical center; blocks group the lines of a
+    Tesseract block (or lines separated by less than one and a half line
+    heights). Regex offsets in a line or block map back to word boxes with
+    two binary searches per match.
+    """
+
+    def __init__(self, words: List[str], left, top, width, height, conf, block=None, par=None, line=None):
+        self.words = words
+        self.left = np.asarray(left, dtype=np.int32)
+        self.top = np.asarray(top, dtype=np.int32)
+        self.width = np.asarray(width, dtype=np.int32)
+        self.height = np.asarray(height, dtype=np.int32)
+        self.conf = np.asarray(conf, dtype=np.float32)
+        count = len(words)
+        self.block = np.asarray(block if block is not None else np.zeros(count), dtype=np.int32)
+        self.par = np.asarray(par if par is not None else np.zeros(count), dtype=np.int32)
+        self.line = np.asarray(line if line is not None else np.zeros(count), dtype=np.int32)
+        self._lines = None
+        self._blocks = None
+
+    @classmethod
+    def from_data(cls, ocr_data: dict) -> "OcrTable":
+        """Build a table from an image_to_data dict, keeping only non-empty words."""
+        keep = [i for i, word in enumerate(ocr_data["text"]) if word and word.strip()]
+
+        def column(key):
+            values = ocr_data.get(key)
+            return [values[i] for i in keep] if values is not None else None
+
+        return cls(
+            [ocr_data["text"][i].strip() for i in keep],
+            column("left"), column("top"), column("width"), column("height"),
+            [float(c) for c in column("conf")] if "conf" in ocr_data else np.zeros(len(keep)),
+            column("block_num"), column("par_num"), column("line_num"),
+        )
+
+    def __len__(self):
+        return len(self.words)
+
+    # ---------------------
+    # Grouping
+    # ---------------------
+    def _unit(self, indices: np.ndarray) -> TextUnit:
+        texts = [self.words[i] for i in indices]
+        lengths = np.fromiter((len(t) for t in texts), dtype=np.int64, count=len(texts))
+        starts = np.zeros(len(texts), dtype=np.int64)
+        if len(texts) > 1:
+            np.cumsum(lengths[:-1] + 1, out=starts[1:])
+        return TextUnit(" ".join(texts), indices, starts, starts + lengths)
+
+    def _line_groups(self) -> List[np.ndarray]:
+        if not len(self):
+            return []
+        if self.line.any():
+            # Tesseract lists words in reading order, so a line is a run of equal ids
+            key = np.stack([self.block, self.par, self.line], axis=1)
+            breaks = np.flatnonzero((key[1:] != key[:-1]).any(axis=1)) + 1
+            return np.split(np.arange(len(self)), breaks)
+
+        centers = self.top + self.height / 2
+        tolerance = max(float(np.median(self.height)) / 2, 1.0)
+        order = np.argsort(centers, kind="stable")
+        groups = []
+        current = [order[0]]
+        line_center = centers[order[0]]
+        for i in order[1:]:
+            if centers[i] - line_center > tolerance:
+                groups.append(current)
+                current = []
+                line_center = centers[i]
+            current.append(i)
+        groups.append(current)
+        return [np.array(sorted(group, key=lambda i: self.left[i])) for group in groups]
+
+    def lines(self) -> List[TextUnit]:
+        if self._lines is None:
+            self._lines = [self._unit(group) for group in self._line_groups()]
+        return self._lines
+
+    def blocks(self) -> List[TextUnit]:
+        if self._blocks is None:
+            groups = self._line_groups()
+            blocks = []
+            if self.line.any():
+                for group in groups:
+                    if blocks and self.block[blocks[-1][-1][0]] == self.block[group[0]]:
+                        blocks[-1].append(group)
+                    else:
+                        blocks.append([group])
+            else:
+                max_gap = 1.5 * float(np.median(self.height)) if len(self) else 0
+                bottom = None
+                for group in groups:
+                    top = self.top[group].min()
+                    if blocks and top - bottom < max_gap:
+                        blocks[-1].append(group)
+                    else:
+                        blocks.append([group])
+                    bottom = (self.top[group] + self.height[group]).max()
+            self._blocks = [self._unit(np.concatenate(block)) for block in blocks]
+        return self._blocks
+
+    def text(self) -> str:
+        return "\n".join(line.text for line in self.lines())
+
+    def unit_offsets(self, units: List[TextUnit]) -> List[int]:
+        """
+        Offset in text() of each line or block. A block is consecutive lines
+        joined with spaces instead of newlines, so it maps onto a slice of
+        text() of the same length.
+        """
+        line_starts = {}
+        offset = 0
+        for line in self.lines():
+            line_starts[int(line.words[0])] = offset
+            offset += len(line.text) + 1
+        return [line_starts[int(unit.words[0])] for unit in units]
+
+    # ---------------------
+    # Matching
+    # ---------------------
+    def find(self, matcher, level: str = "line") -> Iterator[Tuple[PiiMatch, np.ndarray]]:
+        """
+        Yield (match, word indices covered by the match) for every PII hit.
+        Match offsets index into text().
+        """
+        units = self.lines() if level == "line" else self.blocks()
+        for unit, offset in zip(units, self.unit_offsets(units)):
+            for match in matcher.finditer(unit.text, offset):
+                first = np.searchsorted(unit.ends, match.start - offset, side="right")
+                last = np.searchsorted(unit.starts, match.end - offset, side="left")
+                yield match, unit.words[first:last]
+
+    def boxes(self, indices: np.ndarray) -> np.ndarray:
+        """(x0, y0, x1, y1) rows for the given words."""
+        left = self.left[indices]
+        top = self.top[indices]
+        return np.stack([left, top, left + self.width[indices], top + self.height[indices]], axis=1)
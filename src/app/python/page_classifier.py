@@ -0,0 +1,52 @@
+import os
+
+import fitz  # PyMuPDF
+
+# Page kinds
+TEXT = "text"        # real text layer: redact the vector content in place
+SCANNED = "scanned"  # content is only in images (or hidden behind an OCR layer): rasterize + OCR
+EMPTY = "empty"      # nothing drawn on the page: keep as is
+
+# A page whose images cover at least this share of it and whose text covers
+# less than MIN_TEXT_COVERAGE is a scan with a few stray characters (stamps,
+# page numbers), not a text page.
+SCAN_IMAGE_COVERAGE = float(os.getenv("SCAN_IMAGE_COVERAGE", "0.85"))
+MIN_TEXT_COVERAGE = float(os.getenv("MIN_TEXT_COVERAGE", "0.01"))
+
+# Fonts OCR tools use for invisible text layers over scanned images. Redacting
+# that layer would leave the PII visible in the image underneath.
+OCR_LAYER_FONTS = ("GlyphLessFont",)
+
+
+def image_coverage(page) -> float:
+    """Share of the page covered by images (overlaps counted once per image)."""
+    page_area = abs(page.rect) or 1
+    covered = 0.0
+    for info in page.get_image_info():
+        covered += abs(fitz.Rect(info["bbox"]) & page.rect)
+    return min(covered / page_area, 1.0)
+
+
+def text_coverage(page, layout) -> float:
+    """Share of the page covered by character boxes."""
+    page_area = abs(page.rect) or 1
+    covered = sum(abs(fitz.Rect(box)) for box in layout.boxes if box is not None)
+    return min(covered / page_area, 1.0)
+
+
+def has_ocr_layer(page) -> bool:
+    return any(any(name in font[3] for name in OCR_LAYER_FONTS) for font in page.get_fonts())
+
+
+def classify_page(page, layout) -> str:
+    """
+    Pick the cheapest correct path for a page from its text layer (a
+    text_redaction.TextLayout), image coverage and fonts.
+    """
+    if not layout.text.strip():
+        return SCANNED if page.get_image_info() or page.read_contents().strip() else EMPTY
+    if has_ocr_layer(page):
+        return SCANNED
+    if image_coverage(page) >= SCAN_IMAGE_COVERAGE and text_coverage(page, layout) < MIN_TEXT_COVERAGE:
+        return SCANNED
+    return TEXT
@@ -0,0 +1,244 @@
+import io
+import logging
+import math
+import os
+import time
+from dataclasses import dataclass, field
+from typing import Dict, NamedTuple
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+
+try:
+    from .metrics import stage
+except ImportError:
+    from metrics import stage
+
+logger = logging.getLogger(__name__)
+
+# Bump whenever the way redacted pages are written changes, so cached
+# documents produced the old way are not served.
+PAGE_OUTPUT_VERSION = "3"
+
+# ---------------------
+# Encoder configuration
+# ---------------------
+# "auto" writes black-and-white scans as CCITT G4 and everything else as
+# JPEG; "g4", "jpeg" and "flate" (lossless) force one encoding for all pages.
+OUTPUT_ENCODING = os.getenv("REDACT_OUTPUT_ENCODING", "auto")
+
+# JPEG quality, as a number or one of the presets.
+JPEG_PRESETS = {"low": 50, "medium": 75, "high": 90}
+_quality = os.getenv("REDACT_JPEG_QUALITY", "medium")
+JPEG_QUALITY = JPEG_PRESETS[_quality] if _quality in JPEG_PRESETS else int(_quality)
+
+# Resolution redacted page images are stored at. Pages rendered above it for
+# OCR are downsampled; 0 keeps the render resolution.
+OUTPUT_DPI = int(os.getenv("REDACT_OUTPUT_DPI", "200"))
+
+# A grayscale page counts as black and white when at most this share of its
+# pixels are mid-tones (anti-aliased edges of text and rules).
+BILEVEL_MAX_MIDTONES = float(os.getenv("REDACT_BILEVEL_MAX_MIDTONES", "0.03"))
+
+ENCODINGS = ("g4", "jpeg", "flate")
+
+
+def output_signature() -> str:
+    """Everything that changes the written pages, for cache keys."""
+    return f"{PAGE_OUTPUT_VERSION}:{OUTPUT_ENCODING}:{JPEG_QUALITY}:{OUTPUT_DPI}:{BILEVEL_MAX_MIDTONES}"
+
+
+class EncodedImage(NamedTuple):
+    encoding: str
+    data: bytes
+    width: int
+    height: int
+
+
+@dataclass
+class EncodeStats:
+    """Size and time of the encoded page images of a document, per encoding."""
+    pages: Dict[str, int] = field(default_factory=dict)
+    raster_bytes: int = 0   # uncompressed size of the redacted renders
+    encoded_bytes: int = 0
+    seconds: float = 0.0
+
+    def add(self, encoding: str, raster_bytes: int, encoded_bytes: int, seconds: float):
+        self.pages[encoding] = self.pages.get(encoding, 0) + 1
+        self.raster_bytes += raster_bytes
+        self.encoded_bytes += encoded_bytes
+        self.seconds += seconds
+
+    def merge(self, other: "EncodeStats"):
+        for encoding, count in other.pages.items():
+            self.pages[encoding] = self.pages.get(encoding, 0) + count
+        self.raster_bytes += other.raster_bytes
+        self.encoded_bytes += other.encoded_bytes
+        self.seconds += other.seconds
+
+    def to_dict(self) -> dict:
+        return {
+            "pages": dict(self.pages),
+            "raster_bytes": self.raster_bytes,
+            "encoded_bytes": self.encoded_bytes,
+            "ratio": round(self.raster_bytes / self.encoded_bytes, 1) if self.encoded_bytes else None,
+            "encode_ms": round(self.seconds * 1000),
+        }
+
+    def log(self, name: str, input_bytes: int, output_bytes: int):
+        """Report the document's size and encoding time."""
+        logger.info(
+            "%s: %d -> %d bytes, scanned pages %s: %.1f MB raster -> %.1f MB encoded in %.0f ms",
+            name, input_bytes, output_bytes, self.pages or "none",
+            self.raster_bytes / 1e6, self.encoded_bytes / 1e6, self.seconds * 1000,
+        )
+
+
+# ---------------------
+# Encoders
+# ---------------------
+def output_dpi(dpi: int) -> int:
+    """Resolution a page rendered at dpi is stored at."""
+    return min(dpi, OUTPUT_DPI) if OUTPUT_DPI else dpi
+
+
+def downsample(img: Image.Image, dpi: int) -> Image.Image:
+    """Scale a page rendered at dpi down to OUTPUT_DPI (box filter keeps black boxes black)."""
+    if output_dpi(dpi) == dpi:
+        return img
+    scale = OUTPUT_DPI / dpi
+    size = (max(round(img.width * scale), 1), max(round(img.height * scale), 1))
+    return img.resize(size, Image.BOX)
+
+
+def is_bilevel(img: Image.Image) -> bool:
+    if img.mode != "L":
+        return False
+    hist = np.bincount(np.asarray(img).ravel(), minlength=256)
+    return hist[64:192].sum() <= BILEVEL_MAX_MIDTONES * img.width * img.height
+
+
+def _g4(img: Image.Image) -> bytes:
+    """Raw CCITT G4 data of a page, taken from the single strip of a TIFF."""
+    gray = img if img.mode == "L" else img.convert("L")
+    bilevel = gray.point([0] * 128 + [255] * 128, "1")
+    buffer = io.BytesIO()
+    bilevel.save(buffer, "TIFF", compression="group4", strip_size=math.ceil(bilevel.width / 8) * bilevel.height)
+    with Image.open(buffer) as tiff:
+        offset, count = tiff.tag_v2[273], tiff.tag_v2[279]
+    offset = offset[0] if isinstance(offset, tuple) else offset
+    count = count[0] if isinstance(count, tuple) else count
+    return buffer.getvalue()[offset:offset + count]
+
+
+def _jpeg(img: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, "JPEG", quality=JPEG_QUALITY, optimize=True)
+    return buffer.getvalue()
+
+
+def _flate(img: Image.Image) -> bytes:
+    buffer = io.BytesIO()
+    img.save(buffer, "PNG")
+    return buffer.getvalue()
+
+
+_ENCODERS = {"g4": _g4, "jpeg": _jpeg, "flate": _flate}
+
+
+def encode_image(img: Image.Image, dpi: int, encoding: str = None) -> EncodedImage:
+    """Downsample and compress a redacted page image for embedding in the output PDF."""
+    encoding = encoding or OUTPUT_ENCODING
+    if img.mode not in ("L", "RGB"):
+        img = img.convert("RGB")
+    img = downsample(img, dpi)
+    if encoding == "auto":
+        encoding = "g4" if is_bilevel(img) else "jpeg"
+    elif encoding not in _ENCODERS:
+        raise ValueError(f"Unknown output encoding {encoding!r}")
+    return EncodedImage(encoding, _ENCODERS[encoding](img), img.width, img.height)
+
+
+def insert_encoded(page, encoded: EncodedImage):
+    """Draw an encoded image over the whole page."""
+    if encoded.encoding != "g4":
+        # MuPDF keeps JPEG data as is and stores PNG pixels with Flate
+        page.insert_image(page.rect, stream=encoded.data)
+        return
+    # MuPDF would decode a G4 TIFF and store it with Flate: write the image
+    # object with the CCITT data ourselves
+    doc = page.parent
+    xref = doc.get_new_xref()
+    doc.update_object(
+        xref,
+        f"<</Type/XObject/Subtype/Image/Width {encoded.width}/Height {encoded.height}"
+        f"/BitsPerComponent 1/ColorSpace/DeviceGray>>",
+    )
+    doc.update_stream(xref, encoded.data, new=True, compress=False)
+    doc.xref_set_key(xref, "Filter", "/CCITTFaxDecode")
+    doc.xref_set_key(
+        xref, "DecodeParms", f"<</K -1/BlackIs1 true/Columns {encoded.width}/Rows {encoded.height}>>"
+    )
+    page.insert_image(page.rect, xref=xref)
+
+
+def encode_page(img: Image.Image, dpi: int, stats: EncodeStats = None, encoding: str = None) -> EncodedImage:
+    """encode_image, timed as the "encode" stage and recorded in stats."""
+    start = time.perf_counter()
+    with stage("encode"):
+        encoded = encode_image(img, dpi, encoding)
+    if stats is not None:
+        raster_bytes = img.width * img.height * len(img.getbands())
+        stats.add(encoded.encoding, raster_bytes, len(encoded.data), time.perf_counter() - start)
+    return encoded
+
+
+class PageSink:
+    """
+    Output document built a page at a time, in order. Pages that keep their
+    content are copied from the source (objects they share, like fonts, are
+    copied once); redacted scans are written straight from their encoded
+    image, so the source document is never modified and a page's raster can
+    be freed as soon as add_image returns. Memory then holds the compressed
+    output, never more than one page of pixels.
+    """
+
+    def __init__(self, stats: EncodeStats = None):
+        self.doc = fitz.open()
+        self.stats = stats if stats is not None else EncodeStats()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.doc.close()
+
+    @property
+    def page_count(self) -> int:
+        return self.doc.page_count
+
+    def add_page(self, src, page_num: int):
+        """Append page page_num of src as it is."""
+        self.doc.insert_pdf(src, from_page=page_num, to_page=page_num)
+
+    def add_document(self, src):
+        """Append every page of src as it is."""
+        self.doc.insert_pdf(src)
+
+    def add_image(self, rect, img: Image.Image, dpi: int, encoding: str = None):
+        """Append a page of rect's size showing only img, rendered at dpi. encoding overrides OUTPUT_ENCODING."""
+        encoded = encode_page(img, dpi, self.stats, encoding)
+        page = self.doc.new_page(width=rect.width, height=rect.height)
+        insert_encoded(page, encoded)
+
+    def copy_info(self, src):
+        """Take over the metadata and, once every page is in, the outline of src."""
+        self.doc.set_metadata(src.metadata)
+        if self.doc.page_count == src.page_count:
+            self.doc.set_toc(src.get_toc(simple=False))
+
+    def save(self, output):
+        """Write the document to a path or file object."""
+        with stage("save"):
+            self.doc.save(output, garbage=1, deflate=True)
@@ -0,0 +1,192 @@
+import re
+from typing import Iterable, Iterator, List, NamedTuple
+
+# ---------------------
+# PII patterns
+# ---------------------
+# A pattern may expose the part to redact through a "<category>_value" group
+# (e.g. the name after "My name is"); otherwise the whole match is used.
+US_STATES = (
+    "AL|AK|AZ|AR|CA|CO|CT|DE|FL|GA|HI|ID|IL|IN|IA|KS|KY|LA|ME|MD|MA|MI|MN|MS|MO|MT|NE|NV|NH|NJ|"
+    "NM|NY|NC|ND|OH|OK|OR|PA|RI|SC|SD|TN|TX|UT|VT|VA|WA|WV|WI|WY"
+)
+
+NAME_TRIGGERS = ["My name is", "I am", "He is", "She is", "Name:", "name is"]
+
+# Scanned letters often open with a salutation instead of an introduction.
+SCANNED_NAME_TRIGGERS = NAME_TRIGGERS + ["dear,", "mr.", "Hello,", "Hello", "Salutations"]
+
+
+def name_pattern(triggers: List[str]) -> str:
+    return r"(?i:(?:%s) (?P<name_value>[A-Z][a-z]+(?: [A-Z][a-z]+)+))" % "|".join(triggers)
+
+
+# House number, up to 8 street and city words, the last word of the city, an
+# optional state and the ZIP code. Every word and separator is an atomic
+# group, so a line that is not an address fails after trying each way to
+# end the word list, instead of backtracking through every split of the
+# line between overlapping runs of letters and spaces. Needs Python 3.11.
+# The word cap keeps that linear; a longer address is first matched from a
+# number in its middle, and address_start moves the match back to its
+# house number.
+ADDRESS_SEPARATOR = r"(?>\s*,?\s*)"
+ADDRESS_PATTERN = (
+    r"\b\d{1,6}\s++"
+    r"(?>[A-Za-z0-9.'’\-]+%(sep)s){0,8}"
+    r"[A-Za-z][A-Za-z.'’\-]*+"
+    r"(?:%(sep)s(?:%(states)s)\b)?"
+    r"%(sep)s(?<=\s)\d{5}(?:-\d{4})?\b"
+) % {"sep": ADDRESS_SEPARATOR, "states": US_STATES}
+
+ADDRESS_CHARS = frozenset("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789.,'’- \t")
+HOUSE_NUMBER = re.compile(r"\b\d{1,6}\s")
+
+
+def address_start(line: str, start: int, floor: int = 0) -> int:
+    """
+    Where an address match at start really begins: the first house number
+    in the run of address characters (letters, digits, spaces and .,'’-)
+    that leads up to it, not before floor (the end of the previous address).
+    """
+    lo = start
+    while lo > floor and line[lo - 1] in ADDRESS_CHARS:
+        lo -= 1
+    number = HOUSE_NUMBER.search(line, lo, start + 1)
+    return number.start() if number else start
+
+
+PATTERNS = {
+    "address": ADDRESS_PATTERN,
+    "email": r"(?<![\w.])[\w\.\d]+@[\w\d-]+\.[\w\d.-]+",
+    "phone": r"(?:\+1[-.\s]?)?(?:\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4})",
+    "ssn": r"\b\d{3}[-\s]?\d{2}[-\s]?\d{4}\b",
+    "dob": r"\b(?:\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{4}-\d{1,2}-\d{1,2})\b",
+    "name": name_pattern(NAME_TRIGGERS),
+}
+
+SCANNED_PATTERNS = dict(PATTERNS, name=name_pattern(SCANNED_NAME_TRIGGERS))
+
+# What a line must contain for a pattern to match anywhere in it: a regex,
+# or a tuple of ASCII keywords of which one must appear (ignoring case).
+# Lines are screened with these cheap searches first and only the patterns
+# that can apply are run; most prose has no digit, no "@" and no name
+# trigger and skips the regex entirely.
+SCREENS = {
+    "address": r"\d",
+    "email": ("@",),
+    "phone": r"\d",
+    "ssn": r"\d",
+    "dob": r"\d",
+    "name": tuple(NAME_TRIGGERS),
+}
+
+SCANNED_SCREENS = dict(SCREENS, name=tuple(SCANNED_NAME_TRIGGERS))
+
+# Bump whenever PATTERNS, or how matches become redactions, change so that
+# cached outputs derived from matches are invalidated.
+PATTERN_VERSION = "5"
+
+
+class PiiMatch(NamedTuple):
+    category: str
+    text: str
+    start: int
+    end: int
+
+
+class PiiMatcher:
+    """
+    PII detector with every pattern compiled once. Each pattern scans a line
+    on its own, like the per-pattern findall loops it replaced, so a match
+    of one category never hides an overlapping match of another (an email
+    right after a name, a date right after a ZIP code): all of them are
+    returned, in line order.
+
+    With screens (see SCREENS), each line is first screened and only the
+    patterns that can apply to it are run.
+    """
+
+    def __init__(self, patterns: dict = PATTERNS, screens: dict = None):
+        self.patterns = dict(patterns)
+        self.categories = list(patterns)
+        self.regexes = {category: re.compile(pattern) for category, pattern in self.patterns.items()}
+        self._value_groups = {
+            category: f"{category}_value" if f"{category}_value" in regex.groupindex else 0
+            for category, regex in self.regexes.items()
+        }
+        self.screens = {
+            category: re.compile(screen) if isinstance(screen, str) else tuple(word.lower() for word in screen)
+            for category, screen in (screens or {}).items() if category in patterns
+        }
+
+    @property
+    def signature(self) -> str:
+        """The patterns, for cache keys. Screens never change the matches."""
+        return "\n".join(f"{category}={pattern}" for category, pattern in self.patterns.items())
+
+    def _categories_for(self, line: str) -> List[str]:
+        """The categories whose screen passes on line."""
+        if not self.screens:
+            return self.categories
+        passed = {}
+        # Keyword screens ignore case. Outside ASCII, str.lower() and regex
+        # case folding differ, so such lines are not keyword-screened.
+        lowered = line.lower() if line.isascii() else None
+        categories = []
+        for category in self.categories:
+            screen = self.screens.get(category)
+            if screen is not None:
+                if screen not in passed:
+                    passed[screen] = self._screen(screen, line, lowered)
+                if not passed[screen]:
+                    continue
+            categories.append(category)
+        return categories
+
+    @staticmethod
+    def _screen(screen, line: str, lowered: str) -> bool:
+        if isinstance(screen, tuple):
+            return lowered is None or any(word in lowered for word in screen)
+        return screen.search(line) is not None
+
+    def finditer(self, line: str, offset: int = 0) -> Iterator[PiiMatch]:
+        """
+        Yield the matches in a single line, ordered by start. Matches of
+        different categories may overlap. Offsets are shifted by `offset`.
+        """
+        matches = []
+        for category in self._categories_for(line):
+            group = self._value_groups[category]
+            floor = 0
+            for match in self.regexes[category].finditer(line):
+                start, end = match.span(group)
+                if category == "address":
+                    start = address_start(line, start, floor)
+                floor = match.end()
+                matches.append(PiiMatch(category, line[start:end], start + offset, end + offset))
+        matches.sort(key=lambda match: match.start)
+        yield from matches
+
+    def scan(self, text: str) -> Iterator[PiiMatch]:
+        """
+        Yield the matches in a block of text. Lines are scanned independently
+        and offsets refer to positions in `text`.
+        """
+        offset = 0
+        for line in text.split("\n"):
+            if line:
+                yield from self.finditer(line, offset)
+            offset += len(line) + 1
+
+    def find_all(self, text_lines: Iterable[str]) -> List[str]:
+        """Return the matched strings of every line."""
+        return [match.text for line in text_lines for match in self.finditer(line)]
+
+
+default_matcher = PiiMatcher(PATTERNS, SCREENS)
+scanned_matcher = PiiMatcher(SCANNED_PATTERNS, SCANNED_SCREENS)
+
+
+def get_sensitive_data(text_lines) -> List[str]:
+    """Scan lines for PII using the default patterns."""
+    return default_matcher.find_all(text_lines)
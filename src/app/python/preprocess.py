@@ -0,0 +1,201 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+try:
+    from .metrics import stage
+except ImportError:
+    from metrics import stage
+
+# ---------------------
+# Configuration
+# ---------------------
+# Comma-separated stages run in order before thresholding.
+PREPROCESS_STAGES = os.getenv("PREPROCESS_STAGES", "autocontrast,blur")
+
+# "fixed" (PREPROCESS_THRESHOLD_VALUE), "otsu" (global, from the histogram) or
+# "adaptive" (local mean over PREPROCESS_BLOCK_SIZE pixels minus PREPROCESS_OFFSET).
+PREPROCESS_THRESHOLD = os.getenv("PREPROCESS_THRESHOLD", "fixed")
+PREPROCESS_THRESHOLD_VALUE = int(os.getenv("PREPROCESS_THRESHOLD_VALUE", "128"))
+PREPROCESS_BLOCK_SIZE = int(os.getenv("PREPROCESS_BLOCK_SIZE", "31"))
+PREPROCESS_OFFSET = int(os.getenv("PREPROCESS_OFFSET", "10"))
+
+
+class Preprocessor:
+    """
+    Grayscale -> contrast stretch -> blur -> threshold, run on NumPy arrays
+    that are allocated once and reused for every page of the same size or
+    smaller. Each stage works in place, so a page costs no full-size
+    allocations beyond the final 1-bit image handed to OCR.
+
+    Not thread-safe: use one instance per thread or process.
+    """
+
+    def __init__(
+        self,
+        stages=PREPROCESS_STAGES,
+        threshold: str = PREPROCESS_THRESHOLD,
+        threshold_value: int = PREPROCESS_THRESHOLD_VALUE,
+        block_size: int = PREPROCESS_BLOCK_SIZE,
+        offset: int = PREPROCESS_OFFSET,
+    ):
+        if isinstance(stages, str):
+            stages = [stage.strip() for stage in stages.split(",") if stage.strip()]
+        for stage in stages:
+            if stage not in self.STAGES:
+                raise ValueError(f"Unknown preprocessing stage {stage!r}")
+        if threshold not in ("fixed", "otsu", "adaptive", "none"):
+            raise ValueError(f"Unknown threshold mode {threshold!r}")
+        self.stages = list(stages)
+        self.threshold = threshold
+        self.threshold_value = threshold_value
+        self.block_size = block_size | 1
+        self.offset = offset
+        self._buffers = {}
+
+    @property
+    def signature(self) -> str:
+        """Everything that changes the output, for cache keys."""
+        return f"{','.join(self.stages)}:{self.threshold}:{self.threshold_value}:{self.block_size}:{self.offset}"
+
+    def _buffer(self, name: str, shape, dtype) -> np.ndarray:
+        """A reusable array of at least `shape`, viewed as exactly `shape`."""
+        size = shape[0] * shape[1]
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.size < size:
+            buffer = self._buffers[name] = np.empty(size, dtype=dtype)
+        return buffer[:size].reshape(shape)
+
+    def __call__(self, img: Image.Image) -> Image.Image:
+        gray = img if img.mode == "L" else img.convert("L")
+        pixels = self._buffer("pixels", (gray.height, gray.width), np.uint8)
+        np.copyto(pixels, np.asarray(gray))
+        for stage in self.stages:
+            self.STAGES[stage](self, pixels)
+
+        if self.threshold == "none":
+            return Image.fromarray(pixels.copy(), "L")
+        if self.threshold == "adaptive":
+            mask = self._adaptive_mask(pixels)
+        else:
+            value = self._otsu(pixels) if self.threshold == "otsu" else self.threshold_value
+            mask = pixels >= value
+        return Image.fromarray(mask)
+
+    # ---------------------
+    # Stages
+    # ---------------------
+    def autocontrast(self, pixels: np.ndarray):
+        """Stretch the darkest pixel to 0 and the lightest to 255 (ImageOps.autocontrast)."""
+        lo, hi = int(pixels.min()), int(pixels.max())
+        if hi <= lo:
+            return
+        scale = 255.0 / (hi - lo)
+        lut = np.clip(np.arange(256) * scale - lo * scale, 0, 255).astype(np.uint8)
+        np.take(lut, pixels, out=pixels)
+
+    def blur(self, pixels: np.ndarray):
+        """
+        Gaussian blur with sigma 1 as a separable [1, 4, 6, 4, 1] / 16 kernel,
+        accumulated in place in a 16-bit scratch buffer. The two pixels at
+        each border are left as they are.
+        """
+        height, width = pixels.shape
+        if height < 5 or width < 5:
+            return
+        rows = self._buffer("blur_rows", pixels.shape, np.uint16)
+        self._binomial(pixels, rows, axis=1)
+        cols = self._buffer("blur_cols", pixels.shape, np.uint16)
+        self._binomial(rows, cols, axis=0)
+        # rows carried a factor of 16 and cols another 16: round and scale back
+        cols += 128
+        cols >>= 8
+        np.copyto(pixels[2:-2, 2:-2], cols[2:-2, 2:-2], casting="unsafe")
+
+    @staticmethod
+    def _binomial(src: np.ndarray, out: np.ndarray, axis: int):
+        """out = src convolved with [1, 4, 6, 4, 1] along axis (edges copied * 16)."""
+        def shifted(array, start, stop):
+            index = [slice(None), slice(None)]
+            index[axis] = slice(start, stop)
+            return array[tuple(index)]
+
+        inner = shifted(out, 2, -2)
+        # ((a1 + a2 + a3) * 2 + a2) * 2 + a0 + a4 == a0 + 4a1 + 6a2 + 4a3 + a4
+        np.copyto(inner, shifted(src, 1, -3))
+        inner += shifted(src, 2, -2)
+        inner += shifted(src, 3, -1)
+        inner <<= 1
+        inner += shifted(src, 2, -2)
+        inner <<= 1
+        inner += shifted(src, 0, -4)
+        inner += shifted(src, 4, None)
+        np.multiply(shifted(src, 0, 2), 16, out=shifted(out, 0, 2), casting="unsafe")
+        np.multiply(shifted(src, -2, None), 16, out=shifted(out, -2, None), casting="unsafe")
+
+    STAGES = {
+        "autocontrast": autocontrast,
+        "blur": blur,
+    }
+
+    # ---------------------
+    # Thresholds
+    # ---------------------
+    @staticmethod
+    def _otsu(pixels: np.ndarray) -> int:
+        """Threshold maximising the between-class variance of the histogram."""
+        hist = np.bincount(pixels.ravel(), minlength=256).astype(np.float64)
+        levels = np.arange(256)
+        weight_bg = np.cumsum(hist)
+        weight_fg = weight_bg[-1] - weight_bg
+        mass_bg = np.cumsum(hist * levels)
+        mean_bg = mass_bg / np.maximum(weight_bg, 1)
+        mean_fg = (mass_bg[-1] - mass_bg) / np.maximum(weight_fg, 1)
+        variance = weight_bg * weight_fg * (mean_bg - mean_fg) ** 2
+        # pixels <= t are background class 0, so white starts at t + 1
+        return int(np.argmax(variance)) + 1
+
+    def _adaptive_mask(self, pixels: np.ndarray) -> np.ndarray:
+        """
+        White where a pixel is brighter than the mean of the block_size square
+        around it minus offset. Borders are replicated, as in OpenCV.
+        """
+        height, width = pixels.shape
+        half = self.block_size // 2
+        area = self.block_size * self.block_size
+
+        padded = self._buffer("padded", (height + 2 * half, width + 2 * half), np.uint8)
+        padded[half:half + height, half:half + width] = pixels
+        padded[:half, half:half + width] = pixels[:1]
+        padded[half + height:, half:half + width] = pixels[-1:]
+        padded[:, :half] = padded[:, half:half + 1]
+        padded[:, half + width:] = padded[:, half + width - 1:half + width]
+
+        integral = self._buffer("integral", (height + 2 * half + 1, width + 2 * half + 1), np.int64)
+        integral[0, :] = 0
+        integral[:, 0] = 0
+        np.cumsum(padded, axis=0, out=integral[1:, 1:])
+        np.cumsum(integral[1:, 1:], axis=1, out=integral[1:, 1:])
+
+        size = self.block_size
+        sums = self._buffer("sums", pixels.shape, np.int64)
+        np.subtract(integral[size:, size:], integral[:-size, size:], out=sums)
+        sums -= integral[size:, :-size]
+        sums += integral[:-size, :-size]
+        sums -= self.offset * area
+
+        scaled = self._buffer("scaled", pixels.shape, np.int64)
+        np.copyto(scaled, pixels)
+        scaled *= area
+        # pixel > mean - offset  <=>  pixel * area > sum - offset * area
+        return scaled > sums
+
+
+preprocessor = Preprocessor()
+
+
+def preprocess_image(img: Image.Image) -> Image.Image:
+    """Prepare scanned images for OCR."""
+    with stage("preprocess"):
+        return preprocessor(img)
@@ -0,0 +1,273 @@
+"""
+Redaction in two steps: plan, then apply.
+
+Planning does the expensive work once per page (classification, text
+extraction or OCR, PII matching) and returns a PagePlan: the page text,
+every match with its category and offsets into that text, and the boxes to
+black out. Plans are plain data, cached per document page in the "plans"
+namespace, so one detection pass serves the redacted PDF, text extraction
+(ocr_text.pdf_to_text) and the /plan/ dry run. Applying a plan only draws
+it: redaction annotations on text pages, black boxes on a fresh render of
+scanned pages at the output resolution, written page by page to a
+page_output.PageSink.
+
+Boxes are (x0, y0, x1, y1) in PDF points: text layer coordinates on text
+pages (what add_redact_annot expects), rendered page coordinates (pixels
+scaled by 72 / dpi) on scanned pages, so they can be drawn at any dpi.
+"""
+import math
+from dataclasses import dataclass, field
+from typing import List, NamedTuple
+
+import fitz  # PyMuPDF
+from PIL import ImageDraw
+
+try:
+    from .cache import cache, hash_key
+    from .metrics import PAGES, count_matches
+    from .ocr import image_to_data, ocr_signature
+    from .ocr_regions import OCR_REGIONS, find_text_regions, ocr_regions, regions_signature
+    from .ocr_table import OcrTable
+    from .page_classifier import EMPTY, MIN_TEXT_COVERAGE, SCAN_IMAGE_COVERAGE, SCANNED, TEXT, classify_page
+    from .page_output import PageSink, output_dpi
+    from .pii import PATTERN_VERSION, default_matcher
+    from .preprocess import preprocess_image, preprocessor
+    from .render import choose_dpi, policy_signature, render_page_at, timed_ocr
+    from .text_redaction import TEXT_REDACTION_MODE, TextLayout, apply_text_redactions, find_text_redactions
+except ImportError:
+    from cache import cache, hash_key
+    from metrics import PAGES, count_matches
+    from ocr import image_to_data, ocr_signature
+    from ocr_regions import OCR_REGIONS, find_text_regions, ocr_regions, regions_signature
+    from ocr_table import OcrTable
+    from page_classifier import EMPTY, MIN_TEXT_COVERAGE, SCAN_IMAGE_COVERAGE, SCANNED, TEXT, classify_page
+    from page_output import PageSink, output_dpi
+    from pii import PATTERN_VERSION, default_matcher
+    from preprocess import preprocess_image, preprocessor
+    from render import choose_dpi, policy_signature, render_page_at, timed_ocr
+    from text_redaction import TEXT_REDACTION_MODE, TextLayout, apply_text_redactions, find_text_redactions
+
+# Bump whenever what a plan holds or how it is computed changes, so cached
+# plans from the old code are not applied.
+PLAN_VERSION = "1"
+
+
+def _box(x0, y0, x1, y1, scale: float = 1.0) -> list:
+    """A box scaled to points, rounded outwards to 0.01 pt."""
+    return [
+        math.floor(x0 * scale * 100) / 100, math.floor(y0 * scale * 100) / 100,
+        math.ceil(x1 * scale * 100) / 100, math.ceil(y1 * scale * 100) / 100,
+    ]
+
+
+# ---------------------
+# Plans
+# ---------------------
+class Span(NamedTuple):
+    """One PII match and the areas it redacts."""
+    category: str
+    text: str
+    start: int   # offsets into the page text
+    end: int
+    boxes: list  # [x0, y0, x1, y1] in points
+
+
+@dataclass
+class PagePlan:
+    number: int  # page index in the source document
+    kind: str    # page_classifier page kind
+    text: str = ""
+    spans: List[Span] = field(default_factory=list)
+    dpi: int = None  # OCR resolution of scanned pages
+
+    def boxes(self) -> list:
+        return [box for span in self.spans for box in span.boxes]
+
+    def to_dict(self, include_text: bool = True) -> dict:
+        data = {
+            "number": self.number,
+            "kind": self.kind,
+            "dpi": self.dpi,
+            "spans": [span._asdict() for span in self.spans],
+        }
+        if include_text:
+            data["text"] = self.text
+        return data
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "PagePlan":
+        return cls(data["number"], data["kind"], data.get("text", ""),
+                   [Span(**span) for span in data["spans"]], data["dpi"])
+
+
+@dataclass
+class DocumentPlan:
+    pages: List[PagePlan]
+
+    def text(self) -> str:
+        """Page by page text, marking the pages that were read with OCR."""
+        parts = []
+        for page in self.pages:
+            label = " (OCR)" if page.kind == SCANNED else ""
+            parts.append(f"--- Page {page.number + 1}{label} ---\n{page.text.strip()}\n")
+        return "\n".join(parts)
+
+    def summary(self) -> dict:
+        """Page counts by kind and match counts by category."""
+        pages = {}
+        matches = {}
+        for page in self.pages:
+            pages[page.kind] = pages.get(page.kind, 0) + 1
+            for span in page.spans:
+                matches[span.category] = matches.get(span.category, 0) + 1
+        return {"pages": pages, "matches": matches}
+
+    def to_dict(self, include_text: bool = True) -> dict:
+        return {
+            "version": PLAN_VERSION,
+            **self.summary(),
+            "page_plans": [page.to_dict(include_text) for page in self.pages],
+        }
+
+
+# ---------------------
+# Planning
+# ---------------------
+class Planner:
+    """
+    How pages are read: the PII matcher of OCR text and of text layers
+    (text_matcher, default: the same), the default OCR resolution and
+    whether OCR text is matched per line or per block (which lets names
+    span line breaks in letters), and whether scanned pages are OCRed whole
+    or only in their ink regions (ocr_regions; default: OCR_REGIONS).
+    """
+
+    def __init__(self, matcher=default_matcher, ocr_dpi: int = 300, level: str = "line", regions: bool = None,
+                 text_matcher=None):
+        self.matcher = matcher
+        self.text_matcher = text_matcher or matcher
+        self.ocr_dpi = ocr_dpi
+        self.level = level
+        self.regions = OCR_REGIONS == "on" if regions is None else regions
+
+    @property
+    def signature(self) -> str:
+        """Everything that changes a plan, for cache keys."""
+        return hash_key(
+            PLAN_VERSION, PATTERN_VERSION, self.matcher.signature, self.text_matcher.signature, self.level,
+            TEXT_REDACTION_MODE,
+            f"{SCAN_IMAGE_COVERAGE}:{MIN_TEXT_COVERAGE}", policy_signature(self.ocr_dpi), preprocessor.signature,
+            ocr_signature(), regions_signature() if self.regions else "off",
+        )
+
+    def plan_page(self, page, digest: str = None) -> PagePlan:
+        """
+        Plan one page. With the digest of the source document the plan is
+        cached, keyed by page number.
+        """
+        if digest is None:
+            return self._plan(page)
+        key = hash_key(digest, "page_plan", str(page.number), self.signature)
+        cached = cache.get_json("plans", key)
+        if cached is not None:
+            return PagePlan.from_dict(cached)
+        plan = self._plan(page)
+        cache.put_json("plans", key, plan.to_dict())
+        return plan
+
+    def plan_document(self, doc, digest: str = None, page_numbers=None) -> DocumentPlan:
+        """Plan the given pages of an open document (default: all of them)."""
+        if page_numbers is None:
+            page_numbers = range(doc.page_count)
+        return DocumentPlan([self.plan_page(doc[page_num], digest) for page_num in page_numbers])
+
+    def _plan(self, page) -> PagePlan:
+        layout = TextLayout.from_page(page)
+        kind = classify_page(page, layout)
+        if kind == TEXT:
+            spans = [
+                Span(match.category, match.text, match.start, match.end,
+                     [_box(*area) for area in areas])
+                for match, areas in find_text_redactions(page, layout, self.text_matcher)
+            ]
+            return PagePlan(page.number, kind, layout.text, spans)
+        if kind == EMPTY:
+            return PagePlan(page.number, kind)
+
+        dpi = choose_dpi(page, self.ocr_dpi)
+        regions = find_text_regions(page) if self.regions else None
+        if regions is not None:
+            ocr_data = ocr_regions(page, regions, dpi)
+        else:
+            # Detection only needs gray levels; the output is rendered again in color
+            img = render_page_at(page, dpi, keep_color=False)
+            img_preprocessed = preprocess_image(img)
+            del img
+            with timed_ocr(page):
+                ocr_data = image_to_data(img_preprocessed)
+            del img_preprocessed
+
+        table = OcrTable.from_data(ocr_data)
+        scale = 72 / dpi
+        spans = [
+            Span(match.category, match.text, match.start, match.end,
+                 [_box(*box, scale) for box in table.boxes(indices).tolist()])
+            for match, indices in table.find(self.matcher, self.level)
+        ]
+        return PagePlan(page.number, kind, table.text(), spans, dpi)
+
+
+# The planner of the API, redact_pdf and pdf_to_text, which share plans
+default_planner = Planner()
+
+
+# ---------------------
+# Applying
+# ---------------------
+def apply_page(doc, page_num: int, plan: PagePlan, sink: PageSink):
+    """
+    Write page page_num of doc to the sink, redacted as planned. Text pages
+    are redacted in doc and copied; scanned pages become a single redacted
+    image, whose raster is freed once it is encoded. Counted in the page and
+    match metrics.
+    """
+    PAGES.inc(kind=plan.kind)
+    count_matches(plan.spans)
+    page = doc[page_num]
+    boxes = plan.boxes()
+    if plan.kind != SCANNED:
+        if boxes:
+            page.wrap_contents()
+            apply_text_redactions(page, [fitz.Rect(box) for box in boxes])
+        sink.add_page(doc, page_num)
+        return
+
+    dpi = output_dpi(plan.dpi)
+    img = render_page_at(page, dpi)
+    draw = ImageDraw.Draw(img)
+    scale = dpi / 72
+    for x0, y0, x1, y1 in boxes:
+        draw.rectangle(
+            [math.floor(x0 * scale), math.floor(y0 * scale), math.ceil(x1 * scale), math.ceil(y1 * scale)],
+            fill="black",
+        )
+    sink.add_image(page.rect, img, dpi)
+    del draw, img
+    # Drop the scan MuPDF decoded for the renders instead of keeping it
+    # cached next to the pages still to come
+    fitz.TOOLS.store_shrink(100)
+
+
+def redact_pages(planner: Planner, doc, sink: PageSink, digest: str = None, page_numbers=None) -> DocumentPlan:
+    """
+    Plan and write the given pages of doc (default: all of them) one at a
+    time, so only one page is ever held as pixels. Returns the plan.
+    """
+    if page_numbers is None:
+        page_numbers = range(doc.page_count)
+    pages = []
+    for page_num in page_numbers:
+        plan = planner.plan_page(doc[page_num], digest)
+        apply_page(doc, page_num, plan, sink)
+        pages.append(plan)
+    return DocumentPlan(pages)
@@ -0,0 +1,142 @@
+import logging
+import os
+import statistics
+import time
+from contextlib import contextmanager
+
+import fitz  # PyMuPDF
+import numpy as np
+from PIL import Image
+
+try:
+    from .metrics import STAGE_SECONDS
+except ImportError:
+    from metrics import STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# ---------------------
+# Render policy
+# ---------------------
+# "adaptive" picks the DPI per page from the scan resolution and text size;
+# "fixed" renders every scanned page at the caller's default DPI.
+OCR_DPI_MODE = os.getenv("OCR_DPI_MODE", "adaptive")
+OCR_MIN_DPI = int(os.getenv("OCR_MIN_DPI", "150"))
+OCR_MAX_DPI = int(os.getenv("OCR_MAX_DPI", "400"))
+
+# Height in pixels we want a line of text to have in the OCR image. Tesseract
+# is most accurate with capitals around 30 px; a line is a bit taller than that.
+OCR_TARGET_LINE_PX = int(os.getenv("OCR_TARGET_LINE_PX", "40"))
+
+# Resolution of the thumbnail used to estimate text height (1 px = 1 pt).
+PROBE_DPI = 72
+
+
+def policy_signature(default_dpi: int) -> str:
+    """Everything that changes how pages are rasterized, for cache keys."""
+    if OCR_DPI_MODE == "fixed":
+        return f"fixed:{default_dpi}"
+    return f"adaptive:{OCR_MIN_DPI}-{OCR_MAX_DPI}:{OCR_TARGET_LINE_PX}"
+
+
+def source_dpi(page):
+    """Effective resolution of the largest image on the page, or None."""
+    best = None
+    best_area = 0
+    for info in page.get_image_info():
+        bbox = fitz.Rect(info["bbox"])
+        if bbox.is_empty or bbox.width <= 0:
+            continue
+        if bbox.get_area() > best_area:
+            best_area = bbox.get_area()
+            best = info["width"] / (bbox.width / 72)
+    return best
+
+
+def is_color_page(page) -> bool:
+    """True unless every image on the page is single-channel (gray or bilevel)."""
+    infos = page.get_image_info()
+    if not infos:
+        return True
+    return any(info.get("colorspace", 3) != 1 for info in infos)
+
+
+def estimate_line_height(page):
+    """
+    Median height in points of the ink bands of a low resolution grayscale
+    render (horizontal projection profile), or None if the page looks blank.
+    """
+    pix = page.get_pixmap(dpi=PROBE_DPI, colorspace=fitz.csGRAY)
+    pixels = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    ink_rows = (pixels < 128).mean(axis=1) > 0.005
+    heights = []
+    run = 0
+    for has_ink in ink_rows:
+        if has_ink:
+            run += 1
+        elif run:
+            heights.append(run)
+            run = 0
+    if run:
+        heights.append(run)
+    heights = [h for h in heights if 3 <= h <= 72]
+    return statistics.median(heights) if heights else None
+
+
+def choose_dpi(page, default_dpi: int) -> int:
+    """
+    Pick the OCR resolution for a scanned page: enough for text lines to reach
+    OCR_TARGET_LINE_PX, never more than the scan itself holds, within
+    [OCR_MIN_DPI, OCR_MAX_DPI].
+    """
+    if OCR_DPI_MODE == "fixed":
+        return default_dpi
+    dpi = default_dpi
+    line_height = estimate_line_height(page)
+    if line_height:
+        dpi = OCR_TARGET_LINE_PX * 72 / line_height
+    scan_dpi = source_dpi(page)
+    if scan_dpi:
+        dpi = min(dpi, scan_dpi)
+    return int(min(max(dpi, OCR_MIN_DPI), OCR_MAX_DPI))
+
+
+def render_page(page, default_dpi: int, keep_color: bool = True):
+    """
+    Rasterize a scanned page for OCR and redaction at the resolution picked
+    by choose_dpi. Returns (PIL image, dpi).
+    """
+    dpi = choose_dpi(page, default_dpi)
+    return render_page_at(page, dpi, keep_color), dpi
+
+
+def render_page_at(page, dpi: int, keep_color: bool = True):
+    """
+    Rasterize a page at a fixed dpi. Grayscale scans (and every page when
+    keep_color is False, e.g. OCR only) are rendered straight into a
+    grayscale pixmap; only pages with color images pay for RGB.
+    """
+    start = time.perf_counter()
+    if keep_color and is_color_page(page):
+        pix = page.get_pixmap(dpi=dpi)
+        img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+    else:
+        pix = page.get_pixmap(dpi=dpi, colorspace=fitz.csGRAY)
+        img = Image.frombytes("L", [pix.width, pix.height], pix.samples)
+    elapsed = time.perf_counter() - start
+    STAGE_SECONDS.observe(elapsed, stage="render")
+    logger.info(
+        "page %d: rendered %dx%d %s at %d dpi (%.1f MB) in %.0f ms",
+        page.number + 1, img.width, img.height, img.mode, dpi, len(pix.samples) / 1e6, elapsed * 1000,
+    )
+    return img
+
+
+@contextmanager
+def timed_ocr(page):
+    """Log how long the OCR inside the block took for a page."""
+    start = time.perf_counter()
+    yield
+    elapsed = time.perf_counter() - start
+    STAGE_SECONDS.observe(elapsed, stage="ocr")
+    logger.info("page %d: OCR took %.0f ms", page.number + 1, elapsed * 1000)
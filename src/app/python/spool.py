@@ -0,0 +1,47 @@
+"""
+Disk spooling for uploads and redacted outputs.
+
+Documents never live in memory as a whole: uploads are copied to a per-request
+work directory in fixed-size chunks, workers open them by path, write their
+page ranges next to them, and the assembled output is streamed back from disk.
+"""
+import os
+import shutil
+import tempfile
+
+# Where per-request work directories are created. Defaults to the system temp dir.
+SPOOL_DIR = os.getenv("REDACT_SPOOL_DIR") or None
+
+# Read/write size used when copying uploads and streaming responses.
+COPY_CHUNK_SIZE = int(os.getenv("REDACT_COPY_CHUNK_SIZE", str(1024 * 1024)))
+
+
+def make_workdir() -> str:
+    return tempfile.mkdtemp(prefix="redact-", dir=SPOOL_DIR)
+
+
+def remove_workdir(workdir: str):
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+def spool_upload(fileobj, workdir: str, name: str = "input.pdf") -> str:
+    """Copy an uploaded file object into the work directory and return its path."""
+    path = os.path.join(workdir, name)
+    fileobj.seek(0)
+    with open(path, "wb") as f:
+        shutil.copyfileobj(fileobj, f, COPY_CHUNK_SIZE)
+    return path
+
+
+def iter_file(path: str, workdir: str = None):
+    """
+    Yield a file in COPY_CHUNK_SIZE pieces. The work directory is removed once
+    the file has been sent (or the client went away).
+    """
+    try:
+        with open(path, "rb") as f:
+            while chunk := f.read(COPY_CHUNK_SIZE):
+                yield chunk
+    finally:
+        if workdir:
+            remove_workdir(workdir)
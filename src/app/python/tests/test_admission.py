@@ -0,0 +1,118 @@
+"""admission.Budget ordering, oversized reservations and the 429 it leads to."""
+import asyncio
+import os
+import sys
+
+import fitz  # PyMuPDF
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from admission import RETRY_AFTER, AdmissionError, Budget  # noqa: E402
+
+
+async def hold(budget: Budget, amount: int, events: list, name: str, release: asyncio.Event, timeout=None):
+    async with budget.reserve(amount, timeout):
+        events.append(f"{name} in")
+        await release.wait()
+    events.append(f"{name} out")
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_oversized_reservation_runs_alone():
+    async def main():
+        budget = Budget("pages", 10)
+        events = []
+        release = asyncio.Event()
+        big = asyncio.create_task(hold(budget, 50, events, "big", release))
+        await settle()
+        assert events == ["big in"] and budget.in_use == 50
+
+        with pytest.raises(AdmissionError) as error:
+            async with budget.reserve(1, timeout=0.05):
+                pass
+        assert error.value.retry_after == RETRY_AFTER
+        assert "pages budget full" in str(error.value)
+
+        release.set()
+        await big
+        async with budget.reserve(1, timeout=0.05):
+            assert budget.in_use == 1
+        assert budget.in_use == 0
+
+    asyncio.run(main())
+
+
+def test_oversized_reservation_waits_for_the_budget_to_empty():
+    async def main():
+        budget = Budget("pages", 10)
+        events = []
+        first, second = asyncio.Event(), asyncio.Event()
+        small = asyncio.create_task(hold(budget, 5, events, "small", first))
+        await settle()
+        big = asyncio.create_task(hold(budget, 50, events, "big", second))
+        await settle()
+        assert events == ["small in"]
+        first.set()
+        await small
+        await settle()
+        assert events == ["small in", "small out", "big in"]
+        second.set()
+        await big
+
+    asyncio.run(main())
+
+
+def test_reservations_are_first_come_first_served():
+    async def main():
+        budget = Budget("pages", 10)
+        events = []
+        releases = {name: asyncio.Event() for name in ("holder", "large", "small")}
+        tasks = []
+        for name, amount in (("holder", 8), ("large", 5), ("small", 1)):
+            tasks.append(asyncio.create_task(hold(budget, amount, events, name, releases[name])))
+            await settle()
+        # small would fit next to holder, but large asked first
+        assert events == ["holder in"]
+        releases["holder"].set()
+        await settle()
+        assert events == ["holder in", "holder out", "large in", "small in"]
+        for release in releases.values():
+            release.set()
+        await asyncio.gather(*tasks)
+        assert budget.in_use == 0
+
+    asyncio.run(main())
+
+
+def test_zero_capacity_admits_everything():
+    async def main():
+        budget = Budget("memory", 0)
+        async with budget.reserve(10 ** 12, timeout=0):
+            async with budget.reserve(10 ** 12, timeout=0):
+                pass
+
+    asyncio.run(main())
+
+
+def test_full_budget_answers_429_with_retry_after(monkeypatch):
+    from fastapi.testclient import TestClient
+
+    import fastAPI_redactor as api
+
+    budget = Budget("pages", 1)
+    budget.in_use = 1  # held by requests in flight
+    monkeypatch.setattr(api, "pending_pages", budget)
+    monkeypatch.setattr(api, "ADMISSION_WAIT", 0.05)
+    monkeypatch.setattr(api.cache, "copy_to", lambda *args: False)
+
+    doc = fitz.open()
+    doc.new_page().insert_text((72, 72), "Call 555-123-4567")
+    with TestClient(api.app) as client:
+        response = client.post("/redact/", files={"file": ("a.pdf", doc.tobytes(), "application/pdf")})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == str(RETRY_AFTER)
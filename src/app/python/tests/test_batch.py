@@ -0,0 +1,21 @@
+"""Per-document failure reporting of the batch endpoint."""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import fastAPI_redactor as api  # noqa: E402
+from batch import BatchDocument  # noqa: E402
+from jobs import JOB_FAILED  # noqa: E402
+
+
+def test_failed_document_reports_a_fixed_message(monkeypatch, tmp_path, caplog):
+    async def fail(pdf_path, *args, **kwargs):
+        raise RuntimeError(f"cannot open {pdf_path}")
+
+    monkeypatch.setattr(api, "redact_spooled", fail)
+    document = BatchDocument(name="a.pdf", pdf_path=str(tmp_path / "input-0000.pdf"))
+    result = asyncio.run(api.redact_batch_document(document, 0, object(), str(tmp_path), asyncio.Semaphore(1)))
+    assert (result.output_path, result.error) == (None, JOB_FAILED)
+    assert str(tmp_path) in caplog.text
@@ -0,0 +1,36 @@
+"""Manifest bookkeeping of run_folder_batch."""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cache import file_digest  # noqa: E402
+from folder_batch import MANIFEST_NAME, load_manifest, run_folder_batch  # noqa: E402
+
+
+def edit_then_copy(pdf_path, output_path):
+    """A redact_file that finds its input changed while it runs."""
+    with open(pdf_path, "ab") as f:
+        f.write(b"% edited during the run\n")
+    with open(pdf_path, "rb") as source, open(output_path, "wb") as output:
+        output.write(source.read())
+    return {"pages": {"text": 1}, "matches": {}, "input_bytes": 0, "output_bytes": 0}
+
+
+def test_manifest_records_the_input_as_discovered(tmp_path):
+    pdf_path = tmp_path / "a.pdf"
+    pdf_path.write_bytes(b"%PDF-1.7\n")
+    before = os.stat(pdf_path)
+    digest = file_digest(str(pdf_path))
+
+    output = tmp_path / "out"
+    report = run_folder_batch(edit_then_copy, str(tmp_path), str(output), "sig", workers=1, check="hash")
+    assert report["documents"]["redacted"] == 1
+
+    entry = load_manifest(str(output / MANIFEST_NAME))["a.pdf"]
+    assert (entry["size"], entry["mtime_ns"], entry["sha256"]) == (before.st_size, before.st_mtime_ns, digest)
+    # The edit made during the run is picked up by the next one
+    again = run_folder_batch(edit_then_copy, str(tmp_path), str(output), "sig", workers=1, check="hash")
+    assert again["documents"]["redacted"] == 1
+    assert json.loads((output / MANIFEST_NAME).read_text().splitlines()[-1])["sha256"] != digest
@@ -0,0 +1,34 @@
+"""JobQueue failure reporting."""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from jobs import JOB_FAILED, Job, JobError, JobQueue  # noqa: E402
+
+
+def run_failing_job(error: Exception) -> Job:
+    async def runner(job):
+        raise error
+
+    async def main():
+        queue = JobQueue(runner, concurrency=1)
+        queue.start()
+        job = queue.submit(Job(filename="upload.pdf", pdf_path="/srv/spool/abc/input.pdf", workdir="/nonexistent"))
+        await queue._queue.join()
+        await queue.stop()
+        return job
+
+    return asyncio.run(main())
+
+
+def test_job_error_message_is_reported():
+    job = run_failing_job(JobError("Not a readable PDF"))
+    assert (job.status, job.error) == ("failed", "Not a readable PDF")
+
+
+def test_other_errors_are_not_reported(caplog):
+    job = run_failing_job(RuntimeError("cannot open /srv/spool/abc/input.pdf"))
+    assert (job.status, job.error) == ("failed", JOB_FAILED)
+    assert "/srv/spool/abc/input.pdf" in caplog.text
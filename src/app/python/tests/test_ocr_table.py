@@ -0,0 +1,89 @@
+"""OcrTable grouping and PII matching on hand-made OCR word tables."""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ocr_table import OcrTable  # noqa: E402
+from pii import default_matcher, scanned_matcher  # noqa: E402
+
+# (block, line, words) of a letter, as Tesseract numbers them
+LETTER = [
+    (1, 1, "Hello Jane"),
+    (1, 2, "Doe, thank you"),
+    (1, 3, "Mail tel:555-123-4567 or jane@corp.com"),
+    (2, 1, "SSN 123-45-6789 on file"),
+]
+
+
+def ocr_data(lines, with_numbers: bool = True) -> dict:
+    """
+    An image_to_data dict with a row per word and an empty row ending each
+    line. Words are 8 px per character with 6 px spaces, lines 20 px apart,
+    and blocks a further 40 px apart.
+    """
+    data = {key: [] for key in ("text", "left", "top", "width", "height", "conf", "block_num", "par_num", "line_num")}
+    y = 0
+    previous_block = lines[0][0]
+    for block, line, text in lines:
+        if block != previous_block:
+            y += 40
+            previous_block = block
+        x = 10
+        for word in text.split() + [" "]:
+            for key, value in (("text", word), ("left", x), ("top", y), ("width", 8 * len(word)), ("height", 12),
+                               ("conf", "90"), ("block_num", block), ("par_num", 1), ("line_num", line)):
+                data[key].append(value if with_numbers or not key.endswith("_num") else 0)
+            x += 8 * len(word) + 6
+        y += 20
+    return data
+
+
+def found(table, matcher, level):
+    return [(match.category, match.text, [table.words[i] for i in words])
+            for match, words in table.find(matcher, level)]
+
+
+def test_empty_words_are_dropped():
+    table = OcrTable.from_data(ocr_data(LETTER))
+    assert len(table) == sum(len(text.split()) for _, _, text in LETTER)
+    assert table.text().split("\n") == [text for _, _, text in LETTER]
+
+
+def test_matches_map_to_the_words_they_cover():
+    table = OcrTable.from_data(ocr_data(LETTER))
+    assert found(table, default_matcher, "line") == [
+        ("phone", "555-123-4567", ["tel:555-123-4567"]),
+        ("email", "jane@corp.com", ["jane@corp.com"]),
+        ("ssn", "123-45-6789", ["123-45-6789"]),
+    ]
+
+
+def test_blocks_let_names_span_lines():
+    table = OcrTable.from_data(ocr_data(LETTER))
+    assert ("name", "Jane Doe", ["Jane", "Doe,"]) in found(table, scanned_matcher, "block")
+    assert "name" not in [category for category, _, _ in found(table, scanned_matcher, "line")]
+    assert [len(block.words) for block in table.blocks()] == [
+        sum(len(text.split()) for block, _, text in LETTER if block == 1), 4,
+    ]
+
+
+def test_match_offsets_index_into_text():
+    table = OcrTable.from_data(ocr_data(LETTER))
+    text = table.text()
+    for level in ("line", "block"):
+        for match, _ in table.find(scanned_matcher, level):
+            assert text[match.start:match.end].replace("\n", " ") == match.text
+
+
+def test_lines_from_geometry_without_tesseract_numbers():
+    data = ocr_data(LETTER, with_numbers=False)
+    # Words listed out of reading order are put back in order by their boxes
+    order = list(reversed(range(len(data["text"]))))
+    shuffled = {key: [values[i] for i in order] for key, values in data.items()}
+    table = OcrTable.from_data(shuffled)
+    assert table.text().split("\n") == [text for _, _, text in LETTER]
+    assert [len(block.words) for block in table.blocks()] == [9, 4]
+    assert [category for category, _, _ in found(table, default_matcher, "line")] == ["phone", "email", "ssn"]
+    boxes = table.boxes(next(words for match, words in table.find(default_matcher) if match.category == "ssn"))
+    assert boxes.tolist() == [[40, 100, 40 + 88, 112]]
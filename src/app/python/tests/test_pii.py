@@ -0,0 +1,145 @@
+"""
+PiiMatcher against the per-pattern re.findall loop it replaced, the
+get_sensitive_data of redactor.py and fastAPI_redactor.py before the
+shared matcher.
+"""
+import os
+import random
+import re
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pii import US_STATES, PiiMatcher, default_matcher, scanned_matcher  # noqa: E402
+
+BASELINE_PATTERNS = {
+    "email": r"[\w\.\d]+@[\w\d-]+\.[\w\d.-]+",
+    "phone": r"(\+1[-.\s]?)?(\(?\d{3}\)?[-.\s]?\d{3}[-.\s]?\d{4})",
+    "ssn": r"\b\d{3}[-\s]?\d{2}[-\s]?\d{4}\b",
+    "dob": r"\b(?:\d{1,2}[-/]\d{1,2}[-/]\d{2,4}|\d{4}-\d{1,2}-\d{1,2})\b",
+    "name": r"(?i)(?:My name is|I am|He is|She is|Name:|name is) ([A-Z][a-z]+(?: [A-Z][a-z]+)+)",
+    "address": r"\b\d{1,6}\s+[A-Za-z0-9.,'’\- ]+\s*,?\s*[A-Za-z\- ]+\s*,?\s*(?:%s)?\s+\d{5}(?:-\d{4})?\b" % US_STATES,
+}
+
+BASELINE_SCANNED_PATTERNS = dict(
+    BASELINE_PATTERNS,
+    name=r"(?i)(?:My name is|I am|He is|She is|Name:|name is|dear,|mr.|Hello,|Hello|Salutations) "
+         r"([A-Z][a-z]+(?: [A-Z][a-z]+)+)",
+)
+
+MATCHERS = [(default_matcher, BASELINE_PATTERNS), (scanned_matcher, BASELINE_SCANNED_PATTERNS)]
+
+# Lines where a match of one category overlaps a match of another
+OVERLAPS = [
+    "Name: John Smith john.smith@example.com",
+    "My name is Jane Doe jane@corp.com",
+    "Zip 90210 2020-01-02 visit",
+    "Ref 123-45-6789-2020 filed",
+    "Hello Ann Lee ann.lee@mail.org 04/12/1987",
+    "She is Mary Jones, call 555-123-4567 or 555-12-3456",
+]
+
+# Pieces of the mixed lines. Addresses are left out of the comparison: the
+# linear address pattern deliberately no longer matches runs of numbers and
+# words that are not addresses.
+TOKENS = [
+    "the", "report", "was", "filed", "on", "Jane", "Doe", "smith", ",", "-", ".", "@",
+    "john.smith@example.com", "a@b.co", "x.y@", "(555) 123-4567", "555.123.4567", "+1 555 123 4567",
+    "123-45-6789", "123 45 6789", "123456789", "1234567890", "04/12/1987", "2020-01-02", "1/2/03",
+    "90210", "62704", "42", "7", "My name is", "my NAME is", "Name:", "I am", "He is", "she is",
+    "Hello", "Hello,", "dear,", "Mr.", "Salutations", "Ann Lee", "café", "Zoë",
+]
+COMPARED = [category for category in BASELINE_PATTERNS if category != "address"]
+
+
+def baseline(patterns: dict, line: str, categories=None) -> dict:
+    """Sorted matched strings per category, as the findall loop returned them."""
+    found = {}
+    for category in categories or patterns:
+        matches = re.findall(patterns[category], line)
+        found[category] = sorted("".join(match) if isinstance(match, tuple) else match for match in matches)
+    return found
+
+
+def matched(matcher, line: str, categories=None) -> dict:
+    found = {category: [] for category in categories or matcher.categories}
+    for match in matcher.finditer(line):
+        if match.category in found:
+            found[match.category].append(match.text)
+    return {category: sorted(texts) for category, texts in found.items()}
+
+
+def mixed_lines(count: int, seed: int):
+    rng = random.Random(seed)
+    return [" ".join(rng.choice(TOKENS) for _ in range(rng.randint(1, 10))) for _ in range(count)]
+
+
+@pytest.mark.parametrize("matcher, patterns", MATCHERS)
+@pytest.mark.parametrize("line", OVERLAPS)
+def test_overlapping_matches_are_all_found(matcher, patterns, line):
+    assert matched(matcher, line) == baseline(patterns, line)
+
+
+def test_reported_overlaps():
+    assert [(m.category, m.text) for m in default_matcher.finditer("Name: John Smith john.smith@example.com")] == [
+        ("name", "John Smith john"),
+        ("email", "john.smith@example.com"),
+    ]
+    assert [(m.category, m.text) for m in default_matcher.finditer("Zip 90210 2020-01-02 visit")] == [
+        ("ssn", "90210 2020"),
+        ("dob", "2020-01-02"),
+    ]
+
+
+@pytest.mark.parametrize("matcher, patterns", MATCHERS)
+def test_mixed_lines_match_baseline(matcher, patterns):
+    for line in mixed_lines(5000, seed=2):
+        assert matched(matcher, line, COMPARED) == baseline(patterns, line, COMPARED), line
+
+
+def test_scan_offsets_index_into_text():
+    text = "\n".join(OVERLAPS + mixed_lines(200, seed=3))
+    matches = list(default_matcher.scan(text))
+    assert matches
+    assert [match.start for match in matches] == sorted(match.start for match in matches)
+    for match in matches:
+        assert text[match.start:match.end] == match.text
+
+
+# ---------------------
+# Screens and addresses
+# ---------------------
+# Real addresses, redacted exactly as the baseline address pattern did
+ADDRESSES = [
+    "42 Wallaby Way Apt 5 Sydney Town North Some Place Big City CA 90210",
+    "Ship to: 1600 Pennsylvania Avenue NW, Washington, DC 20500",
+    "Call 555-123-4567 then 12 Main St, Springfield, IL 62704 ok",
+    "Box 7 and 9 Elm St Apt 3 Unit 4 Floor 2 Bldg 8 Wing 6 Town ST MA 02134",
+    "221 O'Connor Rd., Lake-View Heights, NY 10001-1234",
+    "Unit 12 1 Infinite Loop Cupertino CA 95014",
+    "Ship to 42 Main Street, Springfield, IL 62704",
+]
+
+# Pieces of addresses and of the lines that only look like one, for the
+# screened/unscreened comparison
+ADDRESS_TOKENS = ["Main", "Street,", "Springfield,", "IL", "CA", "Apt", "5", "1600", "62704-1234", "O'Neil", "Ave."]
+
+
+@pytest.mark.parametrize("matcher, patterns", MATCHERS)
+@pytest.mark.parametrize("line", ADDRESSES)
+def test_addresses_match_baseline(matcher, patterns, line):
+    assert matched(matcher, line) == baseline(patterns, line)
+
+
+@pytest.mark.parametrize("matcher", [default_matcher, scanned_matcher])
+def test_screens_do_not_change_matches(matcher):
+    unscreened = PiiMatcher(matcher.patterns)
+    rng = random.Random(4)
+    tokens = TOKENS + ADDRESS_TOKENS + ADDRESSES
+    for _ in range(35000):
+        line = " ".join(rng.choice(tokens) for _ in range(rng.randint(1, 8)))
+        if rng.random() < 0.1:
+            line = line.upper()
+        assert list(matcher.finditer(line)) == list(unscreened.finditer(line)), line
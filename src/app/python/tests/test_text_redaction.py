@@ -0,0 +1,75 @@
+"""find_text_redactions / apply_text_redactions on generated text pages."""
+import os
+import sys
+
+import fitz  # PyMuPDF
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pii import default_matcher  # noqa: E402
+from text_redaction import TextLayout, apply_text_redactions, find_text_redactions  # noqa: E402
+
+LINES = [
+    "Invoice 2041 for consulting services",
+    "Contact jane.doe@example.com or call (555) 123-4567.",
+    "SSN on file: 123-45-6789",
+    "Name: John Smith john.smith@example.com",
+    "Copy to JANE.DOE@EXAMPLE.COM for the record",
+    "Ship to 12 Main St, Springfield, IL 62704",
+]
+
+
+@pytest.fixture
+def page():
+    doc = fitz.open()
+    page = doc.new_page()
+    for n, line in enumerate(LINES):
+        page.insert_text((72, 72 + 20 * n), line, fontsize=11)
+    yield page
+    doc.close()
+
+
+def covered_text(page, areas) -> str:
+    return " ".join(page.get_textbox(area).strip() for area in areas)
+
+
+def test_layout_offsets_index_character_boxes(page):
+    layout = TextLayout.from_page(page)
+    assert layout.text.split("\n")[:len(LINES)] == LINES
+    assert len(layout.boxes) == len(layout.text)
+    for match in default_matcher.scan(layout.text):
+        rects = layout.rects(match.start, match.end)
+        assert len(rects) == 1
+        assert page.get_textbox(rects[0]).strip() == match.text
+
+
+def test_every_match_is_found_with_its_areas(page):
+    found = find_text_redactions(page)
+    categories = sorted(match.category for match, _ in found)
+    assert categories == sorted(["email", "phone", "ssn", "name", "email", "email", "address"])
+    for match, areas in found:
+        if areas:
+            assert match.text.lower() in covered_text(page, areas).lower()
+
+
+def test_repeats_are_redacted_case_insensitively_once(page):
+    found = find_text_redactions(page)
+    emails = [(match.text, areas) for match, areas in found if match.text.lower() == "jane.doe@example.com"]
+    (first, first_areas), (repeat, repeat_areas) = emails
+    assert len(first_areas) == 2 and repeat_areas == []
+    assert {page.get_textbox(area).strip() for area in first_areas} == {"jane.doe@example.com", "JANE.DOE@EXAMPLE.COM"}
+
+
+def test_offsets_and_search_modes_cover_the_same_text(page):
+    by_offsets = [(match, covered_text(page, areas)) for match, areas in find_text_redactions(page, mode="offsets")]
+    by_search = [(match, covered_text(page, areas)) for match, areas in find_text_redactions(page, mode="search")]
+    assert by_offsets == by_search
+
+
+def test_applied_redactions_remove_the_pii(page):
+    found = find_text_redactions(page)
+    apply_text_redactions(page, [area for _, areas in found for area in areas])
+    text = page.get_text("text")
+    assert list(default_matcher.scan(text)) == []
+    assert "Invoice 2041 for consulting services" in text
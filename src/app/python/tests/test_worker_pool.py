@@ -0,0 +1,91 @@
+"""FairSlots turn order and slot bookkeeping."""
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from worker_pool import FairSlots  # noqa: E402
+
+
+async def chunk(slots: FairSlots, owner: str, n: int, order: list, release: asyncio.Event):
+    async with slots.hold(owner):
+        order.append(f"{owner}{n}")
+        await release.wait()
+
+
+async def settle():
+    for _ in range(5):
+        await asyncio.sleep(0)
+
+
+def test_free_slots_are_taken_without_waiting():
+    async def main():
+        slots = FairSlots(2)
+        async with slots.hold("a"):
+            async with slots.hold("b"):
+                assert slots.free == 0
+        assert slots.free == 2
+
+    asyncio.run(main())
+
+
+def test_owners_take_turns():
+    async def main():
+        slots = FairSlots(1)
+        order = []
+        releases = {}
+        tasks = []
+        # x holds the slot while a queues all of its chunks, then b and c arrive
+        for owner, count in (("x", 1), ("a", 3), ("b", 2), ("c", 1)):
+            for n in range(1, count + 1):
+                releases[f"{owner}{n}"] = asyncio.Event()
+                tasks.append(asyncio.create_task(chunk(slots, owner, n, order, releases[f"{owner}{n}"])))
+        await settle()
+        for expected in ["x1", "a1", "b1", "c1", "a2", "b2", "a3"]:
+            assert order[-1] == expected
+            releases[expected].set()
+            await settle()
+        await asyncio.gather(*tasks)
+        assert slots.free == 1
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_gives_up_its_turn():
+    async def main():
+        slots = FairSlots(1)
+        order = []
+        releases = {name: asyncio.Event() for name in ("a1", "b1", "c1")}
+        tasks = {name: asyncio.create_task(chunk(slots, name[0], 1, order, releases[name])) for name in releases}
+        await settle()
+        tasks["b1"].cancel()
+        await settle()
+        releases["a1"].set()
+        await settle()
+        assert order == ["a1", "c1"]
+        releases["c1"].set()
+        await asyncio.gather(tasks["a1"], tasks["c1"])
+        assert tasks["b1"].cancelled()
+        assert slots.free == 1 and not slots._waiters
+
+    asyncio.run(main())
+
+
+def test_slot_handed_to_a_cancelled_waiter_is_passed_on():
+    async def main():
+        slots = FairSlots(1)
+        order = []
+        releases = {name: asyncio.Event() for name in ("a1", "b1", "c1")}
+        tasks = {name: asyncio.create_task(chunk(slots, name[0], 1, order, releases[name])) for name in releases}
+        await settle()
+        releases["a1"].set()
+        await asyncio.sleep(0)  # a1 releases, handing its slot to b1
+        tasks["b1"].cancel()  # before b1 gets to run
+        await settle()
+        assert order[-1] == "c1"
+        releases["c1"].set()
+        await asyncio.gather(tasks["a1"], tasks["c1"])
+        assert slots.free == 1 and not slots._waiters
+
+    asyncio.run(main())
@@ -0,0 +1,121 @@
+import os
+from typing import List, Tuple
+
+import fitz  # PyMuPDF
+
+try:
+    from .metrics import stage
+    from .pii import PiiMatch, default_matcher
+except ImportError:
+    from metrics import stage
+    from pii import PiiMatch, default_matcher
+
+# "offsets" maps regex offsets to character boxes from a single text
+# extraction; "search" is the old page.search_for per match string.
+TEXT_REDACTION_MODE = os.getenv("TEXT_REDACTION_MODE", "offsets")
+
+# rawdict without embedded image data, which we never look at.
+RAWDICT_FLAGS = fitz.TEXTFLAGS_RAWDICT & ~fitz.TEXT_PRESERVE_IMAGES
+
+
+class TextLayout:
+    """
+    Page text with the bounding box of every character. Lines are joined
+    with "\n" (which has no box), so offsets from PiiMatcher.scan index
+    straight into `boxes`.
+    """
+
+    def __init__(self, text: str, boxes: list):
+        self.text = text
+        self.boxes = boxes
+
+    @classmethod
+    def from_page(cls, page) -> "TextLayout":
+        chars = []
+        boxes = []
+        with stage("extract"):
+            blocks = page.get_text("rawdict", flags=RAWDICT_FLAGS)["blocks"]
+        for block in blocks:
+            if block["type"] != 0:
+                continue
+            for line in block["lines"]:
+                for span in line["spans"]:
+                    for char in span["chars"]:
+                        chars.append(char["c"])
+                        boxes.append(char["bbox"])
+                chars.append("\n")
+                boxes.append(None)
+        return cls("".join(chars), boxes)
+
+    def rects(self, start: int, end: int) -> List[fitz.Rect]:
+        """Return one rectangle per line covered by text[start:end]."""
+        rects = []
+        current = None
+        for box in self.boxes[start:end]:
+            if box is None:
+                if current is not None:
+                    rects.append(current)
+                current = None
+            elif current is None:
+                current = fitz.Rect(box)
+            else:
+                current |= box
+        if current is not None:
+            rects.append(current)
+        return rects
+
+
+def find_occurrences(text: str, needle: str):
+    """Yield the start offset of every occurrence of needle in text."""
+    start = text.find(needle)
+    while start != -1:
+        yield start
+        start = text.find(needle, start + 1)
+
+
+def find_text_redactions(page, layout: TextLayout = None, matcher=default_matcher,
+                         mode: str = None) -> List[Tuple[PiiMatch, List[fitz.Rect]]]:
+    """
+    Find PII on a page with a text layer. Returns (match, areas to redact)
+    pairs; the page is not modified.
+
+    Like page.search_for, every occurrence of a matched string on the page is
+    redacted (case-insensitively), not only the one the pattern fired on, so
+    the first match of a string carries the areas of all its occurrences and
+    repeats of the string carry none.
+    """
+    layout = layout or TextLayout.from_page(page)
+    mode = mode or TEXT_REDACTION_MODE
+    with stage("regex"):
+        matches = list(matcher.scan(layout.text))
+
+    found = []
+    seen = set()
+    with stage("search_for"):
+        text = layout.text.lower()
+        fold = len(text) == len(layout.text)
+        if not fold:
+            # Case folding changed offsets; fall back to an exact search.
+            text = layout.text
+        for match in matches:
+            data = match.text.lower() if fold else match.text
+            if not data or data in seen:
+                found.append((match, []))
+                continue
+            seen.add(data)
+            if mode == "search":
+                areas = page.search_for(match.text)
+            else:
+                areas = []
+                for start in find_occurrences(text, data):
+                    areas.extend(layout.rects(start, start + len(data)))
+            found.append((match, areas))
+    return found
+
+
+def apply_text_redactions(page, areas):
+    """Black out areas of a page, removing the text, vectors and image pixels beneath."""
+    with stage("apply_redactions"):
+        for area in areas:
+            page.add_redact_annot(area, fill=(0, 0, 0))
+        page.apply_redactions()
@@ -0,0 +1,157 @@
+import asyncio
+import collections
+import math
+import os
+from contextlib import asynccontextmanager, nullcontext
+from concurrent.futures import ProcessPoolExecutor
+
+# ---------------------
+# Configuration
+# ---------------------
+# Number of worker processes used to redact pages. Defaults to one per core.
+DEFAULT_WORKERS = int(os.getenv("REDACT_WORKERS", "0")) or (os.cpu_count() or 1)
+
+# Pages handed to a worker in a single task. Larger chunks amortise the cost of
+# re-opening the document in the worker, smaller chunks balance load better.
+DEFAULT_CHUNK_PAGES = int(os.getenv("REDACT_CHUNK_PAGES", "4"))
+
+# Chunks allowed to be queued per worker before submitters have to wait.
+DEFAULT_QUEUE_FACTOR = int(os.getenv("REDACT_QUEUE_FACTOR", "2"))
+
+
+def page_chunks(page_count: int, chunk_pages: int):
+    """Split range(page_count) into contiguous (start, stop) chunks."""
+    chunk_pages = max(1, chunk_pages)
+    return [
+        (start, min(start + chunk_pages, page_count))
+        for start in range(0, page_count, chunk_pages)
+    ]
+
+
+class FairSlots:
+    """
+    Counting semaphore that hands freed slots to its waiters' owners in turn
+    (round robin), first come first served within an owner. A document that
+    queued all of its chunks at once then takes one slot per turn instead of
+    holding back every document that arrived after it.
+    """
+
+    def __init__(self, slots: int):
+        self.free = slots
+        self._waiters = collections.OrderedDict()  # owner -> deque of futures, in turn order
+
+    @asynccontextmanager
+    async def hold(self, owner):
+        if self.free > 0 and not self._waiters:
+            self.free -= 1
+        else:
+            future = asyncio.get_running_loop().create_future()
+            self._waiters.setdefault(owner, collections.deque()).append(future)
+            try:
+                await future
+            except asyncio.CancelledError:
+                if future.done() and not future.cancelled():
+                    # Cancelled just after being handed a slot: pass it on
+                    self._release()
+                else:
+                    self._discard(owner, future)
+                raise
+        try:
+            yield
+        finally:
+            self._release()
+
+    def _release(self):
+        while self._waiters:
+            owner, futures = self._waiters.popitem(last=False)
+            future = futures.popleft()
+            if futures:
+                # The owner's next chunk waits for its next turn
+                self._waiters[owner] = futures
+            if not future.done():
+                future.set_result(None)
+                return
+        self.free += 1
+
+    def _discard(self, owner, future):
+        futures = self._waiters.get(owner)
+        if futures is not None and future in futures:
+            futures.remove(future)
+            if not futures:
+                del self._waiters[owner]
+
+
+class PagePool:
+    """
+    Process pool that spreads the pages of a document across workers.
+
+    Work is submitted as (start, stop) page ranges of a single document. The
+    number of chunks in flight is bounded by FairSlots shared across all
+    requests, so when every worker is busy new chunks wait instead of piling
+    up in the executor queue, and the documents in flight take turns for
+    the slots that free up. With a budget (an admission.Budget), a chunk
+    also reserves its estimated cost from it before it is submitted.
+    """
+
+    def __init__(self, max_workers: int = None, chunk_pages: int = None, queue_factor: int = None, initializer=None,
+                 budget=None):
+        self.max_workers = max_workers or DEFAULT_WORKERS
+        self.initializer = initializer
+        self.budget = budget
+        self.chunk_pages = chunk_pages or DEFAULT_CHUNK_PAGES
+        self.queue_factor = queue_factor or DEFAULT_QUEUE_FACTOR
+        self._executor = None
+        self._slots = None
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, initializer=self.initializer)
+            self._slots = FairSlots(self.max_workers * self.queue_factor)
+
+    def chunks_for(self, page_count: int):
+        """
+        Pick the page ranges for a document. Small documents are split so
+        every worker gets at least one page.
+        """
+        per_worker = math.ceil(page_count / self.max_workers) if page_count else 1
+        return page_chunks(page_count, min(self.chunk_pages, per_worker))
+
+    async def _run_chunk(self, func, args, start, stop, progress, chunk_cost, owner):
+        if self.budget is not None and chunk_cost is not None:
+            reservation = self.budget.reserve(chunk_cost(start, stop))
+        else:
+            reservation = nullcontext()
+        # The slot comes first so the budget is reserved in turn order too
+        async with self._slots.hold(owner), reservation:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(self._executor, func, *args, start, stop)
+        if progress is not None:
+            progress(stop - start)
+        return result
+
+    async def map_pages(self, func, args: tuple, page_count: int, progress=None, chunk_cost=None):
+        """
+        Run func(*args, start, stop) for every chunk of the document and return
+        the results in page order. progress, if given, is called with the
+        number of pages of every chunk that finishes. chunk_cost(start, stop)
+        gives what a chunk reserves from the pool's budget. Every call takes
+        its own turns for slots.
+        """
+        self._ensure_started()
+        owner = object()
+        tasks = [
+            asyncio.ensure_future(self._run_chunk(func, args, start, stop, progress, chunk_cost, owner))
+            for start, stop in self.chunks_for(page_count)
+        ]
+        try:
+            return await asyncio.gather(*tasks)
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            raise
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True, cancel_futures=True)
+            self._executor = None
+            self._slots = None